@@ -5,6 +5,9 @@ See https://www.dropbox.com/developers/reference/content-hash.
 """
 
 import hashlib
+import mmap
+import os
+from concurrent import futures
 
 
 class DropboxContentHasher(object):
@@ -32,11 +35,13 @@ class DropboxContentHasher(object):
     """
 
     BLOCK_SIZE = 4 * 1024 * 1024
+    STATE_VERSION = 1
 
     def __init__(self):
         self._overall_hasher = hashlib.sha256()
         self._block_hasher = hashlib.sha256()
         self._block_pos = 0
+        self._block_digests = []
 
         self.digest_size = self._overall_hasher.digest_size
         # hashlib classes also define 'block_size', but I don't know how people use that value
@@ -45,31 +50,91 @@ class DropboxContentHasher(object):
         if self._overall_hasher is None:
             raise AssertionError("can't use this object anymore; you already called digest()")
 
-        assert isinstance(new_data, bytes), "Expecting a byte string, got {!r}".format(new_data)
+        # Any buffer works (bytes, bytearray, memoryview, mmap); slicing a
+        # memoryview hands hashlib the block without copying it.
+        assert not isinstance(new_data, str), "Expecting a bytes-like object, got {!r}".format(
+            new_data
+        )
+        view = memoryview(new_data).cast("B")
 
         new_data_pos = 0
-        while new_data_pos < len(new_data):
-            if self._block_pos == self.BLOCK_SIZE:
-                self._overall_hasher.update(self._block_hasher.digest())
-                self._block_hasher = hashlib.sha256()
-                self._block_pos = 0
-
+        while new_data_pos < len(view):
             space_in_block = self.BLOCK_SIZE - self._block_pos
-            part = new_data[new_data_pos : (new_data_pos + space_in_block)]
+            part = view[new_data_pos : (new_data_pos + space_in_block)]
             self._block_hasher.update(part)
 
             self._block_pos += len(part)
             new_data_pos += len(part)
+            if self._block_pos == self.BLOCK_SIZE:
+                self._finish_block()
+
+    def block_digests(self):
+        """
+        Returns the SHA-256 digests of the 4 MiB blocks hashed so far, in
+        order, including the digest of a trailing partial block.  The content
+        hash is the SHA-256 of their concatenation, so two lists can be
+        compared block by block to find which ranges of a file differ.
+        """
+        self._check_usable()
+        digests = list(self._block_digests)
+        if self._block_pos > 0:
+            digests.append(self._block_hasher.copy().digest())
+        return digests
+
+    def state(self):
+        """
+        Returns a JSON-serializable checkpoint of the hasher.
+
+        hashlib cannot serialize a SHA-256 midway through a block, so the
+        checkpoint covers whole blocks only: ``state()["offset"]`` is the
+        number of leading bytes it accounts for, and bytes hashed past the
+        last block boundary must be fed again after :meth:`from_state`.
+        """
+        self._check_usable()
+        return {
+            "version": self.STATE_VERSION,
+            "offset": len(self._block_digests) * self.BLOCK_SIZE,
+            "block_digests": [digest.hex() for digest in self._block_digests],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Returns a hasher restored from a :meth:`state` checkpoint, ready to be
+        fed the content from ``state["offset"]`` onwards.
+        """
+        if state.get("version") != cls.STATE_VERSION:
+            raise ValueError("unsupported hasher state version: {!r}".format(state.get("version")))
+        digests = [bytes.fromhex(digest) for digest in state["block_digests"]]
+        if state["offset"] != len(digests) * cls.BLOCK_SIZE:
+            raise ValueError("hasher state offset does not match its block digests")
+        hasher = cls()
+        for digest in digests:
+            if len(digest) != hasher.digest_size:
+                raise ValueError("hasher state has a malformed block digest")
+            hasher._overall_hasher.update(digest)
+        hasher._block_digests = digests
+        return hasher
+
+    def _finish_block(self):
+        digest = self._block_hasher.digest()
+        self._overall_hasher.update(digest)
+        self._block_digests.append(digest)
+        self._block_hasher = hashlib.sha256()
+        self._block_pos = 0
 
-    def _finish(self):
+    def _check_usable(self):
         if self._overall_hasher is None:
             raise AssertionError(
                 "can't use this object anymore; you already called digest() or hexdigest()"
             )
 
+    def _finish(self):
+        self._check_usable()
+
         if self._block_pos > 0:
-            self._overall_hasher.update(self._block_hasher.digest())
-            self._block_hasher = None
+            self._finish_block()
+        self._block_hasher = None
         h = self._overall_hasher
         self._overall_hasher = None  # Make sure we can't use this object anymore.
         return h
@@ -85,6 +150,7 @@ class DropboxContentHasher(object):
         c._overall_hasher = self._overall_hasher.copy()
         c._block_hasher = self._block_hasher.copy()
         c._block_pos = self._block_pos
+        c._block_digests = list(self._block_digests)
         c.digest_size = self.digest_size
         return c
 
@@ -155,7 +221,59 @@ class StreamHasher(object):
 
 
 def content_hash(content):
-    """Return the Dropbox content hash of a ``bytes`` payload as a hex string."""
+    """Return the Dropbox content hash of a bytes-like payload as a hex string."""
     hasher = DropboxContentHasher()
     hasher.update(content)
     return hasher.hexdigest()
+
+
+def parallel_content_hash(path_or_buffer, workers=0):
+    """Return the Dropbox content hash of a file or buffer, hashing blocks concurrently.
+
+    ``path_or_buffer`` is either a path (``str`` or ``os.PathLike``), which is
+    memory-mapped, or any object supporting the buffer protocol. Each 4 MiB
+    block is hashed on one of ``workers`` threads (``0`` means one per CPU);
+    hashlib releases the GIL on large buffers, so the blocks are hashed in
+    parallel and their digests are then folded in order. The result equals
+    ``content_hash`` of the same bytes. A mapped file must not be truncated
+    while it is being hashed.
+    """
+    if isinstance(path_or_buffer, (str, os.PathLike)):
+        with open(path_or_buffer, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return _fold_block_hashes([])
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                view = memoryview(mapped)
+                try:
+                    return _fold_block_hashes(_parallel_block_hashes(view, workers))
+                finally:
+                    view.release()
+    with memoryview(path_or_buffer) as view:
+        return _fold_block_hashes(_parallel_block_hashes(view.cast("B"), workers))
+
+
+def _parallel_block_hashes(view, workers):
+    block_size = DropboxContentHasher.BLOCK_SIZE
+    offsets = range(0, len(view), block_size)
+    workers = workers if workers > 0 else os.cpu_count() or 1
+    workers = min(workers, len(offsets))
+
+    def hash_block(offset):
+        return hashlib.sha256(view[offset : offset + block_size]).digest()
+
+    if workers <= 1:
+        return [hash_block(offset) for offset in offsets]
+    # Submit a bounded window of blocks at a time so hashing a very large
+    # file does not queue one future per block up front.
+    window = workers * 4
+    digests = []
+    with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(offsets), window):
+            digests.extend(executor.map(hash_block, offsets[start : start + window]))
+    return digests
+
+
+def _fold_block_hashes(block_hashes):
+    return hashlib.sha256(b"".join(block_hashes)).hexdigest()
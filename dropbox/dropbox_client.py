@@ -43,7 +43,12 @@ from dropbox.session import (
     HOST_CONTENT,
     HOST_NOTIFY,
     pinned_session,
+    DEFAULT_POOL_MAXSIZE,
     DEFAULT_TIMEOUT,
+    is_shared_session,
+    pool_stats,
+    reserve_connections,
+    shared_session,
 )
 
 PATH_ROOT_HEADER = "Dropbox-API-Path-Root"
@@ -59,6 +64,9 @@ TEAM_AUTH = "team"
 APP_AUTH = "app"
 NO_AUTH = "noauth"
 
+# Request bodies that can be sent again as-is when a request is retried.
+_BINARY_TYPES = (bytes, bytearray, memoryview)
+
 
 class RouteResult(object):
     """The successful result of a call to a route."""
@@ -93,11 +101,13 @@ class RouteErrorResult(object):
         self.obj_result = obj_result
 
 
-def create_session(max_connections=8, proxies=None, ca_certs=None):
+def create_session(max_connections=DEFAULT_POOL_MAXSIZE, proxies=None, ca_certs=None):
     """
     Creates a session object that can be used by multiple :class:`Dropbox` and
     :class:`DropboxTeam` instances. This lets you share a connection pool
-    amongst them, as well as proxy parameters.
+    amongst them, as well as proxy parameters. Clients created without a
+    session already share a process-wide pool; use this when they need their
+    own pool or proxies.
 
     :param int max_connections: Maximum connection pool size.
     :param dict proxies: See the `requests module
@@ -164,8 +174,9 @@ class _DropboxTransport(object):
             helps us identify requests coming from your application. We
             recommend you use the format "AppName/Version". If set, we append
             "/OfficialDropboxPythonSDKv2/__version__" to the user_agent,
-        :param session: If not provided, a new session (connection pool) is
-            created. To share a session across multiple clients, use
+        :param session: If not provided, the process-wide session returned by
+            :func:`dropbox.session.shared_session` is used, so clients share
+            one connection pool per host. To give clients their own pool, use
             :func:`create_session`.
         :type session: :class:`requests.sessions.Session`
         :param dict headers: Additional headers to add to requests.
@@ -219,7 +230,7 @@ class _DropboxTransport(object):
                 )
             self._session = session
         else:
-            self._session = create_session(ca_certs=ca_certs)
+            self._session = shared_session(ca_certs=ca_certs)
         self._headers = headers
 
         base_user_agent = "OfficialDropboxPythonSDKv2/" + __version__
@@ -305,8 +316,9 @@ class _DropboxTransport(object):
         :type route: :class:`stone.backends.python_rsrc.stone_base.Route`
         :param request_arg: Argument for the route that conforms to the
             validator specified by route.arg_type.
-        :param request_binary: String or file pointer representing the binary
-            payload. Use None if there is no binary payload.
+        :param request_binary: Bytes or a bytes-like buffer (``bytearray``,
+            ``memoryview``) representing the binary payload. Use None if
+            there is no binary payload.
         :param Optional[float] timeout: Maximum duration in seconds
             that client will wait for any single packet from the
             server. After the timeout the client will give up on
@@ -385,7 +397,7 @@ class _DropboxTransport(object):
         copy; the caller's arg is not mutated."""
         if not self._auto_content_hash:
             return request_arg
-        if not isinstance(request_binary, bytes):
+        if not isinstance(request_binary, _BINARY_TYPES):
             return request_arg
         if request_arg is None or "content_hash" not in getattr(
             request_arg, "_all_field_names_", ()
@@ -495,8 +507,9 @@ class _DropboxTransport(object):
         :param str request_arg: A JSON-serializable Python object representing
             the argument for the route.
         :param str auth_type: The auth type of the route.
-        :param Optional[bytes] request_binary: Bytes representing the binary
-            payload. Use None if there is no binary payload.
+        :param Optional[bytes] request_binary: Bytes or a bytes-like buffer
+            representing the binary payload. Use None if there is no binary
+            payload.
         :param Optional[float] timeout: Maximum duration in seconds
             that client will wait for any single packet from the
             server. After the timeout the client will give up on
@@ -612,12 +625,17 @@ class _DropboxTransport(object):
         if host not in self._host_map:
             raise ValueError("Unknown value for host: %r" % host)
 
-        if not isinstance(request_binary, (bytes, type(None))):
+        if not isinstance(request_binary, _BINARY_TYPES + (type(None),)):
             # Disallow streams and file-like objects even though the underlying
             # requests library supports them. This is to prevent incorrect
             # behavior when a non-rewindable stream is read from, but the
-            # request fails and needs to be re-tried at a later time.
+            # request fails and needs to be re-tried at a later time. In-memory
+            # buffers can be sent again as they are, so they are accepted
+            # without copying them into bytes.
             raise TypeError("expected request_binary as binary type, got %s" % type(request_binary))
+        if isinstance(request_binary, memoryview) and request_binary.format != "B":
+            # requests sizes the body with len(), which counts items.
+            request_binary = request_binary.cast("B")
 
         # Fully qualified hostname
         fq_hostname = self._host_map[host]
@@ -801,11 +819,32 @@ class _DropboxTransport(object):
 
         return self.clone(headers=new_headers)
 
+    def reserve_connections(self, count):
+        """
+        Returns a context manager that grows this client's connection pool by
+        ``count`` connections per host while it is active. Transfer helpers
+        use it so every worker thread gets a pooled connection.
+
+        :param int count: Number of concurrent requests about to be made.
+        """
+        return reserve_connections(self._session, count)
+
+    def pool_stats(self):
+        """
+        Returns connection pool counters for this client's session, or None
+        for sessions not created by this SDK.
+
+        :rtype: :class:`dropbox.session.PoolStats`
+        """
+        return pool_stats(self._session)
+
     def close(self):
         """
         Cleans up all resources like the request session/network connection.
+        The process-wide shared session is left open for other clients.
         """
-        self._session.close()
+        if not is_shared_session(self._session):
+            self._session.close()
 
     def __enter__(self):
         return self
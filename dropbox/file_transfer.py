@@ -9,34 +9,71 @@ validation, and optional parallel ranged transfers.
 
 from __future__ import absolute_import
 
+import collections
 import contextlib
+import hashlib
 import io
+import itertools
+import json
+import mmap
 import os
+import queue
 import random
+import sqlite3
+import stat
 import tempfile
 import threading
 import time
+from concurrent import futures
 from dataclasses import dataclass
 from urllib import request as urllib_request
 
 import requests
 
 from dropbox import files
-from dropbox.content_hash import DropboxContentHasher, content_hash
+from dropbox.content_hash import DropboxContentHasher, _fold_block_hashes, content_hash
 from dropbox.exceptions import ApiError, HttpError, InternalServerError, RateLimitError
 
 
 DOWNLOAD_CHUNK_SIZE = 32 * 1024
+DOWNLOAD_RANGE_ALIGNMENT = DropboxContentHasher.BLOCK_SIZE
+DOWNLOAD_RANGE_SIZE = 4 * DOWNLOAD_RANGE_ALIGNMENT
 UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_CHUNK_ALIGNMENT = DropboxContentHasher.BLOCK_SIZE
+# Largest multiple of 4 MiB that stays under the 150 MB request body limit.
+UPLOAD_MAX_CHUNK_SIZE = 35 * UPLOAD_CHUNK_ALIGNMENT
+UPLOAD_TARGET_APPEND_SECONDS = 4.0
+UPLOAD_SINGLE_REQUEST_THRESHOLD = 8 * 1024 * 1024
+UPLOAD_SESSION_LIFETIME = 7 * 24 * 60 * 60
+# Journaled sessions older than this are restarted rather than resumed, so
+# there is time left to finish them before the server drops them.
+UPLOAD_SESSION_RESUME_WINDOW = UPLOAD_SESSION_LIFETIME - 60 * 60
+UPLOAD_IDENTITY_SAMPLE_BYTES = 64 * 1024
+UPLOAD_BATCH_MAX_ENTRIES = 1000
+DEFAULT_BATCH_PARALLEL_UPLOADS = 8
 DEFAULT_MAX_ATTEMPTS = 3
 RETRY_BASE_DELAY = 0.2
 RETRY_MAX_DELAY = 5.0
+READ_BLOCK_SIZE = DropboxContentHasher.BLOCK_SIZE
+DEFAULT_READ_PREFETCH = 4
+DEFAULT_BLOCK_CACHE_MEMORY = 64 * 1024 * 1024
+DEFAULT_TREE_FILES = 8
+DEFAULT_HASH_CACHE_ENTRIES = 100000
+DEFAULT_TREE_CONNECTIONS = 16
+DEFAULT_TREE_PARALLEL_DOWNLOADS = 4
+LARGE_FILE_THRESHOLD = 64 * 1024 * 1024
+DEFAULT_TREE_PARALLEL_UPLOADS = 4
+JOURNAL_CHECKPOINT_BYTES = 8 * 1024 * 1024
+PREFETCH_POLL_INTERVAL = 0.05
+PREFETCH_CLOSE_TIMEOUT = 5.0
+INDEX_COMMIT_ENTRIES = 500
 
 
 @dataclass(frozen=True)
 class DownloadInfo:
     size: int
     content_hash: str = None
+    rev: str = None
 
 
 @dataclass(frozen=True)
@@ -44,6 +81,10 @@ class DownloadOptions:
     max_attempts: int = 0
     parallel_downloads: int = 0
     progress: object = None
+    chunk_size: int = 0
+    skip_unchanged: bool = False
+    hash_cache: object = None
+    delta: bool = False
 
 
 @dataclass(frozen=True)
@@ -55,6 +96,35 @@ class DownloadProgress:
 @dataclass(frozen=True)
 class DownloadResult:
     metadata: files.FileMetadata
+    skipped: bool = False
+
+
+@dataclass(frozen=True)
+class TreeDownloadOptions:
+    max_attempts: int = 0
+    max_files: int = 0
+    max_connections: int = 0
+    parallel_downloads: int = 0
+    large_file_threshold: int = 0
+    progress: object = None
+    chunk_size: int = 0
+    skip_unchanged: bool = False
+    hash_cache: object = None
+
+
+@dataclass(frozen=True)
+class TreeDownloadProgress:
+    files_completed: int
+    files_total: int
+    bytes_committed: int
+    total_bytes: int
+
+
+@dataclass(frozen=True)
+class TreeDownloadResult:
+    downloaded: list
+    skipped: list
+    failed: dict
 
 
 @dataclass(frozen=True)
@@ -62,6 +132,39 @@ class UploadOptions:
     max_attempts: int = 0
     parallel_uploads: int = 0
     progress: object = None
+    chunk_size: int = 0
+    adaptive_chunk_size: bool = False
+    single_request_threshold: int = 0
+    journal: object = None
+
+
+@dataclass(frozen=True)
+class TreeUploadOptions:
+    max_attempts: int = 0
+    max_files: int = 0
+    # Concurrent appends per large file; ignored when a journal is set, since
+    # journaled uploads are sequential.
+    parallel_uploads: int = 0
+    large_file_threshold: int = 0
+    batch_size: int = 0
+    progress: object = None
+    hash_cache: object = None
+    journal: object = None
+
+
+@dataclass(frozen=True)
+class TreeUploadProgress:
+    files_completed: int
+    files_total: int
+    bytes_committed: int
+    total_bytes: int
+
+
+@dataclass(frozen=True)
+class TreeUploadResult:
+    uploaded: list
+    skipped: list
+    failed: dict
 
 
 @dataclass(frozen=True)
@@ -75,17 +178,481 @@ class UploadResult:
     metadata: files.FileMetadata
 
 
+@dataclass(frozen=True)
+class BatchUploadOptions:
+    max_attempts: int = 0
+    parallel_uploads: int = 0
+    batch_size: int = 0
+
+
+@dataclass(frozen=True)
+class BatchUploadResult:
+    uploaded: dict
+    failed: dict
+
+
 class TransferError(Exception):
     """Raised when transfer setup or validation fails."""
 
 
+class ContentHashMismatchError(TransferError):
+    """Raised when transferred content does not match the expected content hash."""
+
+
+class UploadCommitError(TransferError):
+    """Raised when Dropbox rejects the commit of one file in an upload batch."""
+
+    def __init__(self, path, error):
+        super(UploadCommitError, self).__init__("commit of {} failed: {}".format(path, error))
+        self.path = path
+        self.error = error
+
+
+class LocalHashCache(object):
+    """Remembers content hashes of local files keyed by file identity.
+
+    Entries are keyed on device, inode, size and modification time, so a file
+    is hashed again only once it has been modified or replaced. Files modified
+    in the last couple of seconds are not cached, because a second write in the
+    same timestamp tick would go unnoticed.
+
+    When ``path`` is given, entries are loaded from that JSON file and
+    :meth:`save` writes them back, so the cache outlives the process. With
+    ``max_entries``, the least recently used entries are dropped beyond that
+    many files.
+    """
+
+    def __init__(self, path=None, max_entries=0):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._hashes = collections.OrderedDict()
+        if path is not None:
+            self._load()
+
+    def content_hash(self, path):
+        stat = os.stat(path)
+        key = _file_identity(stat)
+        with self._lock:
+            cached = self._hashes.get(key)
+            if cached is not None:
+                self._hashes.move_to_end(key)
+                return cached
+        value = _hash_local_file(path)
+        if _file_identity(os.stat(path)) == key and not _recently_modified(stat):
+            with self._lock:
+                self._hashes[key] = value
+                self._evict()
+        return value
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            entries = [list(key) + [value] for key, value in self._hashes.items()]
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(temp_path, self.path)
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+            hashes = {tuple(int(part) for part in entry[:4]): str(entry[4]) for entry in entries}
+        except (OSError, ValueError, TypeError, IndexError):
+            return
+        self._hashes.update(hashes)
+        self._evict()
+
+    def _evict(self):
+        while self.max_entries > 0 and len(self._hashes) > self.max_entries:
+            self._hashes.popitem(last=False)
+
+
+class ContentHashIndex(object):
+    """Persistent index of local file content hashes kept in an SQLite database.
+
+    Each row maps a file's device and inode to its size, modification time,
+    content hash and 4 MiB block digests; a row only answers for a file whose
+    size and modification time still match, so edited or replaced files are
+    hashed again. Files modified in the last couple of seconds are not
+    stored, for the same reason as in :class:`LocalHashCache`. The index is
+    safe to share between threads and can be passed as ``hash_cache`` to the
+    download and tree options.
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS content_hashes ("
+                "dev INTEGER NOT NULL, ino INTEGER NOT NULL, size INTEGER NOT NULL, "
+                "mtime_ns INTEGER NOT NULL, path TEXT NOT NULL, content_hash TEXT NOT NULL, "
+                "block_hashes BLOB NOT NULL, PRIMARY KEY (dev, ino))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS content_hashes_path ON content_hashes (path)"
+            )
+
+    def content_hash(self, path):
+        return self._entry(path)[0]
+
+    def block_hashes(self, path):
+        """Return the ordered SHA-256 digests of the file's 4 MiB blocks."""
+        return self._entry(path)[1]
+
+    def lookup(self, paths):
+        """Return the indexed content hash of each path, or ``None`` when the
+        file is missing, not indexed or changed since it was indexed."""
+        stats = {}
+        for path in paths:
+            try:
+                stats[path] = os.stat(path)
+            except OSError:
+                pass
+        rows = self._select([_file_identity(stat) for stat in stats.values()])
+        result = {}
+        for path in paths:
+            stat = stats.get(path)
+            row = rows.get(_file_identity(stat)) if stat is not None else None
+            result[path] = row[0] if row is not None else None
+        return result
+
+    def invalidate(self, paths=None):
+        """Forget the given paths, or every entry when ``paths`` is None."""
+        with self._lock, self._conn:
+            if paths is None:
+                self._conn.execute("DELETE FROM content_hashes")
+                return
+            self._conn.executemany(
+                "DELETE FROM content_hashes WHERE path = ?", [(path,) for path in paths]
+            )
+
+    def hash_tree(self, directory, workers=0):
+        """Return the content hash of every file under ``directory``.
+
+        Files whose identity is already indexed are not read; the rest are
+        hashed on ``workers`` threads, with at most four files per worker in
+        flight, and added to the index in transactions of
+        ``INDEX_COMMIT_ENTRIES`` files.
+        """
+        stats = {}
+        for root, dirs, names in os.walk(directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if stat.S_ISREG(st.st_mode):
+                    stats[path] = st
+        rows = self._select([_file_identity(st) for st in stats.values()])
+        result = {}
+        missing = []
+        for path, st in stats.items():
+            row = rows.get(_file_identity(st))
+            if row is None:
+                missing.append(path)
+            else:
+                result[path] = row[0]
+        workers = workers if workers > 0 else os.cpu_count() or 1
+        entries = []
+        pending = {}
+        paths = iter(missing)
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                for path in itertools.islice(paths, workers * 4 - len(pending)):
+                    pending[executor.submit(_hash_indexed_file, path)] = path
+                if not pending:
+                    break
+                done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    try:
+                        st, value, digests, cacheable = future.result()
+                    except OSError:
+                        # The file vanished or became unreadable during the scan.
+                        continue
+                    result[path] = value
+                    if cacheable:
+                        entries.append((st, path, value, digests))
+                if len(entries) >= INDEX_COMMIT_ENTRIES:
+                    self._store(entries)
+                    entries = []
+        self._store(entries)
+        return result
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _entry(self, path):
+        key = _file_identity(os.stat(path))
+        row = self._select([key]).get(key)
+        if row is not None:
+            return row
+        stat, value, digests, cacheable = _hash_indexed_file(path)
+        if cacheable:
+            self._store([(stat, path, value, digests)])
+        return value, digests
+
+    def _select(self, keys):
+        rows = {}
+        # Two bound parameters per key; stay below SQLite's default limit of 999.
+        batch = 400
+        with self._lock:
+            for start in range(0, len(keys), batch):
+                part = keys[start : start + batch]
+                query = (
+                    "SELECT dev, ino, size, mtime_ns, content_hash, block_hashes "
+                    "FROM content_hashes WHERE (dev, ino) IN (VALUES {})".format(
+                        ", ".join(["(?, ?)"] * len(part))
+                    )
+                )
+                params = [value for key in part for value in key[:2]]
+                for dev, ino, size, mtime_ns, value, blob in self._conn.execute(query, params):
+                    digests = [blob[i : i + 32] for i in range(0, len(blob), 32)]
+                    rows[(dev, ino, size, mtime_ns)] = (value, digests)
+        return rows
+
+    def _store(self, entries):
+        if not entries:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO content_hashes "
+                "(dev, ino, size, mtime_ns, path, content_hash, block_hashes) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    _file_identity(stat) + (path, value, b"".join(digests))
+                    for stat, path, value, digests in entries
+                ],
+            )
+
+
+class BlockCache(object):
+    """Caches blocks of remote files keyed by file, revision and block index.
+
+    A Dropbox revision never changes, so a cached block stays valid for as
+    long as it is kept. Blocks live in an in-memory LRU tier bounded by
+    ``max_memory_bytes``. When ``directory`` is given, blocks are also
+    written to an on-disk tier bounded by ``max_disk_bytes`` (zero means
+    unbounded), which survives the process and is evicted least recently
+    used first. On-disk names include the block size, so caches with
+    different block sizes can share a directory, and every hit touches the
+    block file's modification time, which orders eviction after a restart.
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes=DEFAULT_BLOCK_CACHE_MEMORY,
+        directory=None,
+        max_disk_bytes=0,
+        block_size=READ_BLOCK_SIZE,
+    ):
+        if max_memory_bytes < 0 or max_disk_bytes < 0:
+            raise TransferError("cache budgets must not be negative")
+        if block_size <= 0:
+            raise TransferError("cache block size must be positive")
+        self.block_size = block_size
+        self.directory = directory
+        self._max_memory = max_memory_bytes
+        self._max_disk = max_disk_bytes
+        self._lock = threading.Lock()
+        self._memory = collections.OrderedDict()
+        self._memory_bytes = 0
+        self._disk = collections.OrderedDict()
+        self._disk_bytes = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._load_disk_index()
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+            name = _block_cache_name(self.block_size, key)
+            if name not in self._disk:
+                return None
+            self._disk.move_to_end(name)
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # atime is unreliable under noatime/relatime mounts, so record
+            # the access in the modification time instead.
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._forget_disk(name)
+            return None
+        with self._lock:
+            self._store_memory(key, data)
+        return data
+
+    def put(self, key, data):
+        data = bytes(data)
+        with self._lock:
+            self._store_memory(key, data)
+        if self.directory is not None:
+            self._store_disk(_block_cache_name(self.block_size, key), data)
+
+    def _store_memory(self, key, data):
+        if len(data) > self._max_memory:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self._max_memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _store_disk(self, name, data):
+        if self._max_disk and len(data) > self._max_disk:
+            return
+        path = os.path.join(self.directory, name)
+        fd, temp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+            raise
+        evicted = []
+        with self._lock:
+            self._forget_disk(name)
+            self._disk[name] = len(data)
+            self._disk_bytes += len(data)
+            while self._max_disk and self._disk_bytes > self._max_disk:
+                evicted_name, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                evicted.append(evicted_name)
+        for evicted_name in evicted:
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(self.directory, evicted_name))
+
+    def _forget_disk(self, name):
+        size = self._disk.pop(name, None)
+        if size is not None:
+            self._disk_bytes -= size
+
+    def _load_disk_index(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime_ns, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._disk[name] = size
+            self._disk_bytes += size
+
+
+class JSONUploadJournal(object):
+    """Upload session journal kept in a single JSON file.
+
+    The file is rewritten atomically on every change, which is fine for a
+    handful of uploads at a time. Use :class:`SQLiteUploadJournal` when many
+    uploads share a journal.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        with self._lock:
+            return self._read().get(key)
+
+    def save(self, key, record):
+        with self._lock:
+            records = self._read()
+            records[key] = record
+            self._write(records)
+
+    def delete(self, key):
+        with self._lock:
+            records = self._read()
+            if records.pop(key, None) is not None:
+                self._write(records)
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                records = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return records if isinstance(records, dict) else {}
+
+    def _write(self, records):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(records, f)
+        os.replace(temp_path, self.path)
+
+
+class SQLiteUploadJournal(object):
+    """Upload session journal kept in an SQLite database."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS upload_sessions "
+                "(key TEXT PRIMARY KEY, record TEXT NOT NULL)"
+            )
+
+    def load(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record FROM upload_sessions WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    def save(self, key, record):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO upload_sessions (key, record) VALUES (?, ?)",
+                (key, json.dumps(record)),
+            )
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM upload_sessions WHERE key = ?", (key,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
 class BytesTarget(object):
     """In-memory download target."""
 
+    # write_at accepts any bytes-like object and never keeps a reference to
+    # it, so downloads can hand it views over a reused read buffer.
+    accepts_memoryview = True
+
     def __init__(self):
         self._lock = threading.RLock()
         self._info = None
         self._data = None
+        self._hasher = None
         self._committed = False
 
     def prepare(self, info):
@@ -96,6 +663,9 @@ class BytesTarget(object):
                 raise TransferError("download target is already prepared")
             self._info = info
             self._data = bytearray(info.size)
+            self._hasher = None
+            if info.content_hash:
+                self._hasher = _DownloadHasher(info.size, self._read_at)
             self._committed = False
 
     def write_at(self, data, offset):
@@ -108,27 +678,31 @@ class BytesTarget(object):
             if end > len(self._data):
                 raise IOError("short write")
             self._data[offset:end] = data
+            if self._hasher is not None:
+                self._hasher.update(offset, data)
             return len(data)
 
     def commit(self):
         with self._lock:
             if self._data is None or self._info is None:
                 raise TransferError("download target is not prepared")
-            if self._info.content_hash:
-                actual = content_hash(bytes(self._data))
+            if self._hasher is not None:
+                actual = self._hasher.hexdigest()
                 if actual != self._info.content_hash:
-                    raise TransferError(
+                    raise ContentHashMismatchError(
                         'download content hash mismatch: got "{}", expected "{}"'.format(
                             actual, self._info.content_hash
                         )
                     )
             self._committed = True
             self._info = None
+            self._hasher = None
 
     def abort(self, cause=None):
         with self._lock:
             self._info = None
             self._data = None
+            self._hasher = None
             self._committed = False
 
     def bytes(self):
@@ -137,16 +711,42 @@ class BytesTarget(object):
                 return None
             return bytes(self._data)
 
+    def _read_at(self, offset, length):
+        return memoryview(self._data)[offset : offset + length]
+
 
 class FileTarget(object):
-    """File download target that commits by atomically renaming a temp file."""
+    """File download target that commits by atomically renaming a temp file.
 
-    def __init__(self, path):
+    With ``resumable=True`` the temp file gets a stable name next to ``path``
+    and a sidecar journal records the remote revision and the byte ranges
+    written so far. An interrupted download leaves both behind, and a later
+    download into the same path fetches only the missing ranges as long as the
+    remote file has not changed.
+
+    Writes go to the temp file with positional ``os.pwrite`` calls where the
+    platform has them, so parallel range workers do not share a file position
+    or a lock. With ``use_mmap=True`` the preallocated temp file is memory
+    mapped and each write is a copy into the mapping instead.
+    """
+
+    # write_at accepts any bytes-like object and never keeps a reference to
+    # it, so downloads can hand it views over a reused read buffer.
+    accepts_memoryview = True
+
+    def __init__(self, path, resumable=False, use_mmap=False):
         self.path = path
-        self._lock = threading.Lock()
+        self.resumable = resumable
+        self.use_mmap = use_mmap
+        self._lock = threading.RLock()
         self._info = None
         self._file = None
+        self._map = None
         self._temp_path = None
+        self._hasher = None
+        self._ranges = []
+        self._unjournaled = 0
+        self._discard = False
 
     def prepare(self, info):
         if info.size < 0:
@@ -154,12 +754,21 @@ class FileTarget(object):
         with self._lock:
             if self._file is not None:
                 raise TransferError("download target is already prepared")
-            directory = os.path.dirname(os.path.abspath(self.path)) or "."
-            prefix = "." + os.path.basename(self.path) + "."
-            fd, temp_path = tempfile.mkstemp(prefix=prefix, suffix=".part", dir=directory)
-            f = os.fdopen(fd, "r+b")
+            ranges = []
+            if self.resumable:
+                temp_path = self._resumable_temp_path()
+                ranges = self._load_journal(info)
+                f = open(temp_path, "r+b" if ranges else "w+b")
+            else:
+                directory = os.path.dirname(os.path.abspath(self.path)) or "."
+                prefix = "." + os.path.basename(self.path) + "."
+                fd, temp_path = tempfile.mkstemp(prefix=prefix, suffix=".part", dir=directory)
+                f = os.fdopen(fd, "r+b")
+            file_map = None
             try:
                 f.truncate(info.size)
+                if self.use_mmap and info.size > 0:
+                    file_map = mmap.mmap(f.fileno(), info.size)
             except Exception:
                 f.close()
                 with contextlib.suppress(OSError):
@@ -167,17 +776,62 @@ class FileTarget(object):
                 raise
             self._info = info
             self._file = f
+            self._map = file_map
             self._temp_path = temp_path
+            self._hasher = None
+            if info.content_hash:
+                self._hasher = _DownloadHasher(info.size, self._read_at)
+            self._ranges = ranges
+            self._unjournaled = 0
+            self._discard = False
 
     def write_at(self, data, offset):
-        with self._lock:
-            if self._file is None:
-                raise TransferError("download target is not prepared")
-            self._file.seek(offset)
-            written = self._file.write(data)
-            if written != len(data):
+        f = self._file
+        file_map = self._map
+        if f is None:
+            raise TransferError("download target is not prepared")
+        if file_map is not None:
+            end = offset + len(data)
+            if offset < 0 or end > len(file_map):
                 raise IOError("short write")
+            file_map[offset:end] = data
+            written = len(data)
+        elif hasattr(os, "pwrite"):
+            written = os.pwrite(f.fileno(), data, offset)
+        else:
+            with self._lock:
+                f.seek(offset)
+                written = f.write(data)
+                if written != len(data):
+                    raise IOError("short write")
+        if written <= 0:
             return written
+        if written < len(data):
+            data = memoryview(data)[:written]
+        if self._hasher is not None:
+            self._hasher.update(offset, data)
+        if self.resumable:
+            with self._lock:
+                self._ranges = _add_range(self._ranges, offset, written)
+                self._unjournaled += written
+                if self._unjournaled >= JOURNAL_CHECKPOINT_BYTES:
+                    self._checkpoint()
+        return written
+
+    def resume_ranges(self):
+        """Return the byte ranges already written for this target.
+
+        Before :meth:`prepare` this reports what an interrupted download left in
+        the journal; the ranges are only trusted once :meth:`prepare` has
+        checked them against the remote metadata.
+        """
+        with self._lock:
+            if self._file is not None:
+                return list(self._ranges)
+        if not self.resumable or not os.path.exists(self._resumable_temp_path()):
+            return []
+        journal = _read_download_journal(self._journal_path())
+        return journal[1] if journal else []
 
     def commit(self):
         with self._lock:
@@ -186,60 +840,125 @@ class FileTarget(object):
             self._file.flush()
             stat_size = os.fstat(self._file.fileno()).st_size
             if stat_size != self._info.size:
+                self._discard = True
                 raise TransferError(
                     "download size mismatch: got {} bytes, expected {}".format(
                         stat_size, self._info.size
                     )
                 )
-            if self._info.content_hash:
-                self._file.seek(0)
-                hasher = DropboxContentHasher()
-                while True:
-                    chunk = self._file.read(1024 * 1024)
-                    if not chunk:
-                        break
-                    hasher.update(chunk)
-                actual = hasher.hexdigest()
+            if self._hasher is not None:
+                actual = self._hasher.hexdigest()
                 if actual != self._info.content_hash:
-                    raise TransferError(
+                    self._discard = True
+                    raise ContentHashMismatchError(
                         'download content hash mismatch: got "{}", expected "{}"'.format(
                             actual, self._info.content_hash
                         )
                     )
+            self._close_map()
             self._file.close()
             self._file = None
             os.replace(self._temp_path, self.path)
             self._temp_path = None
             self._info = None
+            self._hasher = None
+            if self.resumable:
+                with contextlib.suppress(OSError):
+                    os.remove(self._journal_path())
 
     def abort(self, cause=None):
         with self._lock:
+            keep = self.resumable and not self._discard and bool(self._ranges)
             if self._file is not None:
+                if keep:
+                    with contextlib.suppress(Exception):
+                        self._checkpoint()
+                with contextlib.suppress(Exception):
+                    self._close_map()
                 with contextlib.suppress(Exception):
                     self._file.close()
                 self._file = None
             if self._temp_path:
-                with contextlib.suppress(OSError):
-                    os.remove(self._temp_path)
+                if not keep:
+                    with contextlib.suppress(OSError):
+                        os.remove(self._temp_path)
+                    if self.resumable:
+                        with contextlib.suppress(OSError):
+                            os.remove(self._journal_path())
                 self._temp_path = None
             self._info = None
+            self._hasher = None
+            self._ranges = []
+
+    def _read_at(self, offset, length):
+        if self._map is not None:
+            return self._map[offset : offset + length]
+        if hasattr(os, "pread"):
+            return os.pread(self._file.fileno(), length, offset)
+        with self._lock:
+            self._file.flush()
+            self._file.seek(offset)
+            return self._file.read(length)
+
+    def _close_map(self):
+        if self._map is not None:
+            file_map = self._map
+            self._map = None
+            file_map.close()
+
+    def _resumable_temp_path(self):
+        directory = os.path.dirname(os.path.abspath(self.path)) or "."
+        return os.path.join(directory, "." + os.path.basename(self.path) + ".part")
+
+    def _journal_path(self):
+        return self._resumable_temp_path() + ".journal"
+
+    def _load_journal(self, info):
+        if not os.path.exists(self._resumable_temp_path()):
+            return []
+        journal = _read_download_journal(self._journal_path())
+        if journal is None:
+            return []
+        journal_info, ranges = journal
+        try:
+            _validate_download_metadata(journal_info, info)
+        except TransferError:
+            return []
+        return ranges
+
+    def _checkpoint(self):
+        self._file.flush()
+        _write_download_journal(self._journal_path(), self._info, self._ranges)
+        self._unjournaled = 0
 
 
 def Bytes():
     return BytesTarget()
 
 
-def File(path):
-    return FileTarget(path)
+def File(path, resumable=False, use_mmap=False):
+    return FileTarget(path, resumable=resumable, use_mmap=use_mmap)
 
 
 class FileSource(object):
-    def __init__(self, path):
+    """Upload source backed by a local file.
+
+    With ``use_mmap`` the file is mapped once and every range is read as a
+    memoryview slice of the mapping, so request bodies go out without being
+    copied and without opening the file per range. The file must not be
+    truncated while it is mapped; :meth:`close` releases the mapping once
+    no slices are in use.
+    """
+
+    def __init__(self, path, use_mmap=False):
         self.path = path
         stat = os.stat(path)
         if not os.path.isfile(path):
             raise TransferError("upload source is not a regular file: {}".format(path))
         self._size = stat.st_size
+        self._use_mmap = use_mmap
+        self._map = None
+        self._lock = threading.Lock()
 
     def size(self):
         return self._size
@@ -249,8 +968,31 @@ class FileSource(object):
 
     def open_range(self, offset, length):
         _validate_range(self._size, offset, length)
+        if self._use_mmap:
+            return _BufferReader(self._mapped()[offset : offset + length])
         return _SectionReader(open(self.path, "rb"), offset, length)
 
+    def close(self):
+        with self._lock:
+            if self._map is None:
+                return
+            try:
+                self._map.close()
+            except BufferError:
+                # Slices are still referenced; the mapping is released when
+                # they are garbage collected.
+                return
+            self._map = None
+
+    def _mapped(self):
+        with self._lock:
+            if self._size == 0:
+                return memoryview(b"")
+            if self._map is None:
+                with open(self.path, "rb") as f:
+                    self._map = mmap.mmap(f.fileno(), self._size, access=mmap.ACCESS_READ)
+            return memoryview(self._map)
+
 
 class BytesSource(object):
     def __init__(self, data):
@@ -291,8 +1033,8 @@ class ReaderSource(object):
             return _ReaderCloser(self._reader)
 
 
-def FileUpload(path):
-    return FileSource(path)
+def FileUpload(path, use_mmap=False):
+    return FileSource(path, use_mmap=use_mmap)
 
 
 def BytesUpload(data):
@@ -315,8 +1057,16 @@ def HTTPUpload(url, timeout=None):
 
 
 class Downloader(object):
-    def __init__(self, client):
+    """Downloads Dropbox files into targets.
+
+    ``max_connections`` caps the download requests in flight at once across
+    every download this instance runs, including the ranged workers of
+    parallel downloads. Zero leaves requests unlimited.
+    """
+
+    def __init__(self, client, max_connections=0):
         self.client = client
+        self._limiter = threading.BoundedSemaphore(max_connections) if max_connections > 0 else None
 
     def download(self, remote_path, target, options=None):
         if self.client is None:
@@ -327,27 +1077,216 @@ class Downloader(object):
             raise TransferError("download target is required")
         options = options or DownloadOptions()
         max_attempts = options.max_attempts if options.max_attempts > 0 else DEFAULT_MAX_ATTEMPTS
-        if options.parallel_downloads > 1:
+        chunk_size = options.chunk_size if options.chunk_size > 0 else DOWNLOAD_CHUNK_SIZE
+        if options.skip_unchanged:
+            skipped = self._skip_unchanged(
+                remote_path, target, max_attempts, options.hash_cache or _default_hash_cache
+            )
+            if skipped is not None:
+                return skipped
+        seed_path = _target_path(target) if options.delta else None
+        if seed_path and os.path.isfile(seed_path) and not _target_resume_ranges(target):
+            return self._download_with_parallel_fallback(
+                remote_path,
+                target,
+                max_attempts,
+                max(options.parallel_downloads, 1),
+                options.progress,
+                chunk_size,
+                seed_path=seed_path,
+            )
+        if options.parallel_downloads > 1 or _target_resume_ranges(target):
             return self._download_with_parallel_fallback(
-                remote_path, target, max_attempts, options.parallel_downloads, options.progress
+                remote_path,
+                target,
+                max_attempts,
+                max(options.parallel_downloads, 1),
+                options.progress,
+                chunk_size,
             )
-        return self._download_sequential(remote_path, target, max_attempts, options.progress)
+        return self._download_sequential(
+            remote_path, target, max_attempts, options.progress, chunk_size
+        )
+
+    def _skip_unchanged(self, remote_path, target, max_attempts, hash_cache):
+        # Compare against the remote metadata alone, so an unchanged file
+        # costs one metadata call instead of a download.
+        local_path = _target_path(target)
+        if not local_path or not os.path.isfile(local_path):
+            return None
+        metadata = _retry_call(max_attempts, self.client.files_get_metadata, remote_path)
+        if isinstance(metadata, files.FileMetadata) and _unchanged_local_file(
+            local_path, metadata, hash_cache
+        ):
+            return DownloadResult(metadata, skipped=True)
+        return None
 
     def download_file(self, dropbox_path, local_path, rev=None, progress=None):
         if rev is not None:
             dropbox_path = "rev:{}".format(rev)
         return self.download(dropbox_path, File(local_path), DownloadOptions(progress=progress))
 
+    def stream(self, remote_path, chunk_size=0, max_attempts=0):
+        """Yield the content of ``remote_path`` in order as ``bytes`` chunks.
+
+        Nothing is preallocated, so memory use stays at about one chunk. A
+        dropped connection is resumed with a ranged request from the last
+        yielded byte after checking that the remote metadata is unchanged.
+        Chunks are hashed as they are yielded and the generator raises
+        :class:`ContentHashMismatchError` after the last chunk if the content
+        does not match the remote content hash, so consumers must not treat
+        the data as verified until iteration finishes.
+        """
+        if self.client is None:
+            raise TransferError("download client is required")
+        if not remote_path:
+            raise TransferError("download path is required")
+        max_attempts = max_attempts if max_attempts > 0 else DEFAULT_MAX_ATTEMPTS
+        chunk_size = chunk_size if chunk_size > 0 else DOWNLOAD_CHUNK_SIZE
+        attempts = _DownloadAttempts(self, remote_path, max_attempts, chunk_size)
+        hasher = DropboxContentHasher()
+        with contextlib.closing(attempts.bodies()) as bodies:
+            for body in bodies:
+                info = attempts.info
+                while attempts.offset < info.size:
+                    try:
+                        chunk = body.read(min(chunk_size, info.size - attempts.offset))
+                    except Exception as err:
+                        attempts.last_err = err
+                        break
+                    if not chunk:
+                        attempts.last_err = EOFError("unexpected EOF")
+                        break
+                    hasher.update(chunk)
+                    attempts.offset += len(chunk)
+                    yield chunk
+                else:
+                    if body.read(1):
+                        raise TransferError("download response exceeded expected size")
+                    actual = hasher.hexdigest()
+                    if info.content_hash and actual != info.content_hash:
+                        raise ContentHashMismatchError(
+                            'download content hash mismatch: got "{}", expected "{}"'.format(
+                                actual, info.content_hash
+                            )
+                        )
+                    return
+
+    def download_tree(self, remote_folder, local_dir, options=None):
+        """Mirror every file under ``remote_folder`` into ``local_dir``.
+
+        The folder is listed recursively while a pool of ``max_files`` workers
+        downloads the files already listed. Small files each use a single
+        request; files of at least ``large_file_threshold`` bytes are fetched
+        with ``parallel_downloads`` ranged requests. ``max_connections`` caps
+        the requests in flight across all files. Failed files are reported in
+        the result instead of stopping the rest of the tree.
+
+        With ``skip_unchanged``, files whose local copy already has the listed
+        content hash are skipped without any download request.
+        """
+        if self.client is None:
+            raise TransferError("download client is required")
+        if remote_folder is None:
+            raise TransferError("download folder is required")
+        if not local_dir:
+            raise TransferError("local directory is required")
+        options = options or TreeDownloadOptions()
+        max_files = options.max_files if options.max_files > 0 else DEFAULT_TREE_FILES
+        max_connections = (
+            options.max_connections if options.max_connections > 0 else DEFAULT_TREE_CONNECTIONS
+        )
+        parallel_downloads = (
+            options.parallel_downloads
+            if options.parallel_downloads > 0
+            else DEFAULT_TREE_PARALLEL_DOWNLOADS
+        )
+        threshold = (
+            options.large_file_threshold
+            if options.large_file_threshold > 0
+            else LARGE_FILE_THRESHOLD
+        )
+        skip_cache = None
+        if options.skip_unchanged:
+            skip_cache = options.hash_cache or _default_hash_cache
+        downloader = Downloader(self.client, max_connections=max_connections)
+        tracker = _TreeProgressTracker(options.progress)
+        prefix = remote_folder.rstrip("/")
+        jobs = queue.Queue(maxsize=max_files * 4)
+        downloaded = []
+        skipped = []
+        failed = {}
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                entry = jobs.get()
+                if entry is None:
+                    return
+                file_options = DownloadOptions(
+                    max_attempts=options.max_attempts,
+                    parallel_downloads=parallel_downloads if entry.size >= threshold else 0,
+                    progress=tracker.file_progress(),
+                    chunk_size=options.chunk_size,
+                )
+                try:
+                    local_path = _tree_local_path(local_dir, prefix, entry.path_display)
+                    if _unchanged_local_file(local_path, entry, skip_cache):
+                        result = DownloadResult(entry, skipped=True)
+                    else:
+                        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                        result = downloader.download(
+                            entry.path_lower, File(local_path), file_options
+                        )
+                except Exception as err:
+                    with lock:
+                        failed[entry.path_display] = err
+                    tracker.file_done()
+                    continue
+                with lock:
+                    (skipped if result.skipped else downloaded).append(result.metadata)
+                tracker.file_done(entry.size if result.skipped else 0)
+
+        with _reserve_connections(self.client, max_files):
+            threads = [threading.Thread(target=worker) for _ in range(max_files)]
+            for thread in threads:
+                thread.start()
+            try:
+                os.makedirs(local_dir, exist_ok=True)
+                for entry in _list_folder_files(self.client, remote_folder, options.max_attempts):
+                    if isinstance(entry, files.FolderMetadata):
+                        os.makedirs(
+                            _tree_local_path(local_dir, prefix, entry.path_display), exist_ok=True
+                        )
+                    elif isinstance(entry, files.FileMetadata):
+                        tracker.add_file(entry.size)
+                        jobs.put(entry)
+            finally:
+                for _ in threads:
+                    jobs.put(None)
+                for thread in threads:
+                    thread.join()
+        return TreeDownloadResult(downloaded, skipped, failed)
+
     def _download_with_parallel_fallback(
-        self, remote_path, target, max_attempts, parallel_downloads, progress
+        self,
+        remote_path,
+        target,
+        max_attempts,
+        parallel_downloads,
+        progress,
+        chunk_size,
+        seed_path=None,
     ):
         try:
             metadata, info, first_written = self._prepare_parallel_download(
-                remote_path, target, max_attempts
+                remote_path, target, max_attempts, chunk_size
             )
         except ApiError as err:
             if _is_unsatisfiable_initial_range(err):
-                return self._download_sequential(remote_path, target, max_attempts, progress)
+                return self._download_sequential(
+                    remote_path, target, max_attempts, progress, chunk_size
+                )
             raise
         return self._download_prepared_parallel(
             remote_path,
@@ -358,78 +1297,54 @@ class Downloader(object):
             max_attempts,
             parallel_downloads,
             progress,
+            chunk_size,
+            seed_path,
         )
 
-    def _download_sequential(self, remote_path, target, max_attempts, progress):
-        metadata = None
-        info = None
-        prepared = False
-        committed = 0
+    def _download_sequential(self, remote_path, target, max_attempts, progress, chunk_size):
+        attempts = _DownloadAttempts(self, remote_path, max_attempts, chunk_size)
         tracker = None
-        last_err = None
         try:
-            for attempt in range(max_attempts):
-                try:
-                    metadata_response, body = self._download_range_retryable(
-                        remote_path, committed, None
-                    )
-                except Exception as err:
-                    if not _is_retryable_transfer_error(err):
-                        raise
-                    last_err = err
-                    _wait_for_retry(attempt, max_attempts)
-                    continue
-                if body is None:
-                    last_err = TransferError("download response body is nil")
-                    _wait_for_retry(attempt, max_attempts)
-                    continue
-                try:
-                    if not prepared:
-                        metadata, info = _download_metadata(metadata_response)
+            with contextlib.closing(attempts.bodies()) as bodies:
+                for body in bodies:
+                    info = attempts.info
+                    if tracker is None:
                         target.prepare(info)
                         tracker = _ProgressTracker(info.size, progress, DownloadProgress)
-                        prepared = True
-                    else:
-                        _validate_download_metadata(metadata, metadata_response)
-                    remaining = info.size - committed
+                    remaining = info.size - attempts.offset
                     if remaining < 0:
                         raise TransferError(
                             "download exceeded expected size: got at least {} bytes, expected {}".format(
-                                committed, info.size
+                                attempts.offset, info.size
                             )
                         )
                     written, copy_err, retryable = _copy_download_range(
-                        body, target, committed, remaining, tracker
+                        body, target, attempts.offset, remaining, tracker, chunk_size=chunk_size
                     )
-                    committed += written
-                    if copy_err is None and committed == info.size:
+                    attempts.offset += written
+                    if copy_err is None and attempts.offset == info.size:
                         target.commit()
-                        return DownloadResult(metadata)
+                        return DownloadResult(attempts.metadata)
                     if copy_err is None:
                         copy_err = TransferError(
                             "incomplete download: got {} bytes, expected {}".format(
-                                committed, info.size
+                                attempts.offset, info.size
                             )
                         )
                         retryable = True
-                    last_err = copy_err
                     if not retryable:
                         raise copy_err
-                    _wait_for_retry(attempt, max_attempts)
-                finally:
-                    with contextlib.suppress(Exception):
-                        body.close()
-            raise last_err or TransferError("download failed")
+                    attempts.last_err = copy_err
         except Exception as err:
-            if prepared:
+            if tracker is not None:
                 target.abort(err)
             raise
 
-    def _prepare_parallel_download(self, remote_path, target, max_attempts):
+    def _prepare_parallel_download(self, remote_path, target, max_attempts, chunk_size):
         last_err = None
         for attempt in range(max_attempts):
             try:
-                metadata, body = self._download_range_retryable(remote_path, 0, 1)
+                metadata, body = self._download_range_retryable(remote_path, 0, 1, chunk_size)
             except Exception as err:
                 if not _is_retryable_transfer_error(err):
                     raise
@@ -476,54 +1391,121 @@ class Downloader(object):
         max_attempts,
         parallel_downloads,
         progress,
+        chunk_size,
+        seed_path=None,
     ):
         tracker = _ProgressTracker(info.size, progress, DownloadProgress)
-        tracker.add(first_written)
         try:
-            ranges = _split_ranges(first_written, info.size - first_written, parallel_downloads)
-            errors = []
-            lock = threading.Lock()
-
-            def worker(byte_range):
-                try:
-                    self._download_byte_range(
-                        remote_path, target, byte_range, metadata, max_attempts, tracker
-                    )
-                except Exception as err:
-                    with lock:
-                        errors.append(err)
-
-            threads = [threading.Thread(target=worker, args=(r,)) for r in ranges]
-            for thread in threads:
-                thread.start()
-            for thread in threads:
-                thread.join()
-            if errors:
-                raise errors[0]
+            covered = _add_range(_target_resume_ranges(target), 0, first_written)
+            seeded = 0
+            # Without a content hash nothing would catch a local copy that is
+            # not a prefix of the remote file, so only seed when one exists.
+            if seed_path and info.content_hash:
+                seeded = _seed_from_local_file(seed_path, target, first_written, info.size)
+                covered = _add_range(covered, first_written, seeded)
+            tracker.add(sum(r.length for r in covered))
+            self._download_ranges(
+                remote_path,
+                target,
+                metadata,
+                _missing_ranges(covered, info.size),
+                max_attempts,
+                parallel_downloads,
+                tracker,
+                chunk_size,
+            )
             if tracker.committed_bytes() != info.size:
                 raise TransferError(
                     "incomplete download: committed {} of {} bytes".format(
                         tracker.committed_bytes(), info.size
                     )
                 )
-            target.commit()
+            try:
+                target.commit()
+            except ContentHashMismatchError:
+                if not seeded:
+                    raise
+                # The local copy was not a prefix of the new remote content:
+                # download the seeded range again and leave the rest in place.
+                self._download_ranges(
+                    remote_path,
+                    target,
+                    metadata,
+                    _add_range([], first_written, seeded),
+                    max_attempts,
+                    parallel_downloads,
+                    _ProgressTracker(info.size, None, DownloadProgress),
+                    chunk_size,
+                )
+                target.commit()
             return DownloadResult(metadata)
         except Exception as err:
             target.abort(err)
             raise
 
+    def _download_ranges(
+        self,
+        remote_path,
+        target,
+        metadata,
+        ranges,
+        max_attempts,
+        parallel_downloads,
+        tracker,
+        chunk_size,
+    ):
+        scheduler = _RangeScheduler(ranges, DOWNLOAD_RANGE_SIZE, DOWNLOAD_RANGE_ALIGNMENT)
+        errors = []
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                task = scheduler.next_task()
+                if task is None:
+                    return
+                try:
+                    self._download_byte_range(
+                        remote_path,
+                        target,
+                        task,
+                        scheduler,
+                        metadata,
+                        max_attempts,
+                        tracker,
+                        chunk_size,
+                    )
+                except Exception as err:
+                    scheduler.fail()
+                    with lock:
+                        errors.append(err)
+                    return
+                scheduler.finish(task)
+
+        with _reserve_connections(self.client, parallel_downloads):
+            threads = [threading.Thread(target=worker) for _ in range(parallel_downloads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+
     def _download_byte_range(
-        self, remote_path, target, byte_range, metadata, max_attempts, tracker
+        self, remote_path, target, task, scheduler, metadata, max_attempts, tracker, chunk_size
     ):
-        committed = 0
+        position = task.offset
         last_err = None
+
+        def reserve(offset, size):
+            return scheduler.reserve(task, offset, size)
+
         for attempt in range(max_attempts):
-            remaining = byte_range.length - committed
-            if remaining == 0:
+            remaining = task.end - position
+            if remaining <= 0:
                 return
             try:
                 response_metadata, body = self._download_range_retryable(
-                    remote_path, byte_range.offset + committed, remaining
+                    remote_path, position, remaining, chunk_size
                 )
             except Exception as err:
                 if not _is_retryable_transfer_error(err):
@@ -538,15 +1520,15 @@ class Downloader(object):
             try:
                 _validate_download_metadata(metadata, response_metadata)
                 written, copy_err, retryable = _copy_download_range(
-                    body, target, byte_range.offset + committed, remaining, tracker
+                    body, target, position, remaining, tracker, reserve, chunk_size
                 )
-                committed += written
-                if copy_err is None and committed == byte_range.length:
+                position += written
+                if copy_err is None and position == task.end:
                     return
                 if copy_err is None:
                     copy_err = TransferError(
                         "incomplete range at offset {}: got {} bytes, expected {}".format(
-                            byte_range.offset, committed, byte_range.length
+                            task.offset, position - task.offset, task.end - task.offset
                         )
                     )
                     retryable = True
@@ -559,11 +1541,232 @@ class Downloader(object):
                     body.close()
         raise last_err or TransferError("download range failed")
 
-    def _download_range_retryable(self, remote_path, offset, length):
+    def _download_range_retryable(self, remote_path, offset, length, chunk_size):
+        if self._limiter is None:
+            return self._request_download_range(remote_path, offset, length, chunk_size)
+        self._limiter.acquire()
+        try:
+            metadata, body = self._request_download_range(remote_path, offset, length, chunk_size)
+        except BaseException:
+            self._limiter.release()
+            raise
+        if body is None:
+            self._limiter.release()
+            return metadata, body
+        return metadata, _ReleasingReader(body, self._limiter.release)
+
+    def _request_download_range(self, remote_path, offset, length, chunk_size):
         if offset or length is not None:
-            return _files_download_range(self.client, remote_path, offset, length)
+            return _files_download_range(self.client, remote_path, offset, length, chunk_size)
         metadata, body = self.client.files_download(remote_path)
-        return metadata, _readable_response(body)
+        return metadata, _readable_response(body, chunk_size)
+
+
+class RemoteFileReader(io.RawIOBase):
+    """Seekable, read-only file object over a Dropbox file.
+
+    Content is fetched with ranged requests of ``block_size`` bytes. Up to
+    ``prefetch`` blocks ahead of the read position are requested in the
+    background, so sequential readers get close to parallel throughput while
+    readahead memory stays at about ``(prefetch + 1) * block_size``. Seeking
+    drops the blocks outside the new window and cancels their requests if
+    they have not started. Every response is checked against the metadata
+    fetched when the reader was opened, so a file that changes underneath
+    the reader raises :class:`TransferError` instead of mixing revisions.
+
+    Pass a :class:`BlockCache` as ``cache`` to serve repeated reads of the
+    same revision without network requests; blocks then use the cache's
+    block size.
+
+    Example:
+
+        with RemoteFileReader(dbx, "/archive.zip") as f:
+            with zipfile.ZipFile(f) as archive:
+                archive.extractall("archive")
+    """
+
+    def __init__(
+        self,
+        client,
+        remote_path,
+        prefetch=DEFAULT_READ_PREFETCH,
+        block_size=0,
+        max_attempts=0,
+        cache=None,
+    ):
+        super(RemoteFileReader, self).__init__()
+        # Set up first so close() works even when opening the file fails.
+        self._blocks = {}
+        self._executor = futures.ThreadPoolExecutor(max_workers=max(prefetch, 1))
+        if client is None:
+            raise TransferError("download client is required")
+        if not remote_path:
+            raise TransferError("download path is required")
+        if prefetch < 0:
+            raise TransferError("prefetch must not be negative")
+        self.client = client
+        self.path = remote_path
+        self._prefetch = prefetch
+        self._downloader = Downloader(client)
+        if cache is not None:
+            if block_size > 0 and block_size != cache.block_size:
+                raise TransferError("block size must match the cache block size")
+            block_size = cache.block_size
+        self._block_size = block_size if block_size > 0 else READ_BLOCK_SIZE
+        self._cache = cache
+        self._max_attempts = max_attempts if max_attempts > 0 else DEFAULT_MAX_ATTEMPTS
+        metadata = _retry_call(self._max_attempts, client.files_get_metadata, remote_path)
+        if not isinstance(metadata, files.FileMetadata):
+            raise TransferError("remote path is not a file: {}".format(remote_path))
+        self.metadata = metadata
+        self._size = int(metadata.size)
+        self._position = 0
+
+    @property
+    def size(self):
+        return self._size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        self._check_not_closed()
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._check_not_closed()
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise ValueError("invalid whence: {}".format(whence))
+        if position < 0:
+            raise ValueError("negative seek position {}".format(position))
+        self._position = position
+        self._trim(position // self._block_size)
+        return position
+
+    def readinto(self, buffer):
+        self._check_not_closed()
+        view = memoryview(buffer).cast("B")
+        if self._position >= self._size or not len(view):
+            return 0
+        index = self._position // self._block_size
+        block = self._block(index)
+        start = self._position - index * self._block_size
+        count = min(len(view), len(block) - start)
+        view[:count] = block[start : start + count]
+        self._position += count
+        return count
+
+    def read(self, size=-1):
+        self._check_not_closed()
+        remaining = self._size - self._position
+        if size is None or size < 0 or size > remaining:
+            size = max(remaining, 0)
+        data = bytearray(size)
+        view = memoryview(data)
+        filled = 0
+        while filled < size:
+            count = self.readinto(view[filled:])
+            if count == 0:
+                break
+            filled += count
+        view.release()
+        if filled < size:
+            del data[filled:]
+        return bytes(data)
+
+    def readall(self):
+        return self.read()
+
+    def close(self):
+        if not self.closed:
+            for future in self._blocks.values():
+                future.cancel()
+            self._blocks = {}
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        super(RemoteFileReader, self).close()
+
+    def _check_not_closed(self):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+
+    def _block(self, index):
+        self._trim(index)
+        # Drop failed prefetches so their blocks are requested again instead
+        # of re-raising a stale error.
+        for block_index, future in list(self._blocks.items()):
+            if future.done() and not future.cancelled() and future.exception() is not None:
+                del self._blocks[block_index]
+        last = min(index + self._prefetch, (self._size - 1) // self._block_size)
+        for block_index in range(index, last + 1):
+            if block_index not in self._blocks:
+                self._blocks[block_index] = self._executor.submit(self._fetch_block, block_index)
+        future = self._blocks[index]
+        try:
+            return future.result()
+        except BaseException:
+            if self._blocks.get(index) is future:
+                del self._blocks[index]
+            raise
+
+    def _trim(self, index):
+        for block_index in list(self._blocks):
+            if block_index < index or block_index > index + self._prefetch:
+                self._blocks.pop(block_index).cancel()
+
+    def _fetch_block(self, index):
+        key = None
+        if self._cache is not None:
+            key = (self.metadata.id or self.metadata.path_lower, self.metadata.rev, index)
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+        data = self._download_block(index)
+        if key is not None:
+            self._cache.put(key, data)
+        return data
+
+    def _download_block(self, index):
+        offset = index * self._block_size
+        length = min(self._block_size, self._size - offset)
+        target = _MemoryTarget(length)
+        tracker = _ProgressTracker(length, None, DownloadProgress)
+        attempts = _DownloadAttempts(
+            self._downloader,
+            self.path,
+            self._max_attempts,
+            DOWNLOAD_CHUNK_SIZE,
+            metadata=self.metadata,
+            offset=offset,
+            end=offset + length,
+        )
+        with contextlib.closing(attempts.bodies()) as bodies:
+            for body in bodies:
+                committed = attempts.offset - offset
+                written, copy_err, retryable = _copy_download_range(
+                    body, target, committed, length - committed, tracker
+                )
+                attempts.offset += written
+                if copy_err is None and attempts.offset == offset + length:
+                    return target.data
+                if copy_err is None:
+                    copy_err = TransferError(
+                        "incomplete range at offset {}: got {} bytes, expected {}".format(
+                            offset, attempts.offset - offset, length
+                        )
+                    )
+                    retryable = True
+                if not retryable:
+                    raise copy_err
+                attempts.last_err = copy_err
 
 
 class Uploader(object):
@@ -583,30 +1786,229 @@ class Uploader(object):
             raise TransferError("upload destination path is required")
         options = options or UploadOptions()
         max_attempts = options.max_attempts if options.max_attempts > 0 else DEFAULT_MAX_ATTEMPTS
+        sizer = _upload_chunk_sizer(options)
+        threshold = _single_request_threshold(options)
+        size = source.size() if hasattr(source, "size") else -1
+        if 0 <= size <= threshold:
+            return self._upload_single_request(
+                source, size, commit_info, max_attempts, options.progress
+            )
+        if options.journal is not None:
+            if not hasattr(source, "open_range") or size < 0:
+                raise TransferError("journaled uploads require a ranged upload source")
+            # Only sequential sessions report their committed offset, which is
+            # what lets a resumed upload reconcile with the server.
+            return self._upload_sequential(
+                source, commit_info, max_attempts, options.progress, sizer, options.journal
+            )
         if options.parallel_uploads > 1:
             if not hasattr(source, "open_range") or not hasattr(source, "size"):
                 raise TransferError("parallel uploads require a ranged upload source")
+            if options.chunk_size and options.chunk_size % UPLOAD_CHUNK_ALIGNMENT:
+                raise TransferError(
+                    "parallel upload chunk size must be a multiple of {} bytes".format(
+                        UPLOAD_CHUNK_ALIGNMENT
+                    )
+                )
             if source.size() == 0:
-                return self._upload_sequential(source, commit_info, max_attempts, options.progress)
+                return self._upload_sequential(
+                    source, commit_info, max_attempts, options.progress, sizer
+                )
             return self._upload_parallel(
-                source, commit_info, max_attempts, options.parallel_uploads, options.progress
+                source, commit_info, max_attempts, options.parallel_uploads, options.progress, sizer
             )
-        return self._upload_sequential(source, commit_info, max_attempts, options.progress)
+        return self._upload_sequential(source, commit_info, max_attempts, options.progress, sizer)
 
     def upload_file(self, local_path, commit_info, progress=None):
         return self.upload(FileUpload(local_path), commit_info, UploadOptions(progress=progress))
 
-    def _upload_sequential(self, source, commit_info, max_attempts, progress):
+    def upload_tree(self, local_dir, remote_folder, options=None):
+        """Upload every new or changed file under ``local_dir`` to ``remote_folder``.
+
+        The remote folder is listed recursively first. A local file is skipped
+        when a remote file at the same path has the same size and content
+        hash; local hashes come from ``hash_cache``, so unchanged files are
+        not read again on later runs when the cache is persistent. Files
+        below ``large_file_threshold`` bytes are committed together through
+        :class:`BatchUploader`; larger files are uploaded ``max_files`` at a
+        time with ``parallel_uploads`` concurrent appends each. With a
+        ``journal``, large files are instead appended sequentially so that an
+        interrupted upload can resume from the journaled offset, and
+        ``parallel_uploads`` is ignored. Changed files are overwritten. Failed
+        files are reported in the result instead of stopping the rest of the
+        tree, so running the upload again picks up where it stopped.
+        """
+        if self.client is None:
+            raise TransferError("upload client is required")
+        if not local_dir or not os.path.isdir(local_dir):
+            raise TransferError("local directory is required")
+        if remote_folder is None:
+            raise TransferError("upload folder is required")
+        options = options or TreeUploadOptions()
+        max_files = options.max_files if options.max_files > 0 else DEFAULT_TREE_FILES
+        parallel_uploads = (
+            options.parallel_uploads
+            if options.parallel_uploads > 0
+            else DEFAULT_TREE_PARALLEL_UPLOADS
+        )
+        if options.journal is not None:
+            # Uploader.upload appends journaled uploads sequentially.
+            parallel_uploads = 1
+        threshold = (
+            options.large_file_threshold
+            if options.large_file_threshold > 0
+            else LARGE_FILE_THRESHOLD
+        )
+        hash_cache = options.hash_cache or _default_hash_cache
+        tracker = _TreeProgressTracker(options.progress, TreeUploadProgress)
+        prefix = remote_folder.rstrip("/")
+        remote = _list_remote_files(self.client, prefix, options.max_attempts)
+        uploaded = []
+        skipped = []
+        failed = {}
+        small = []
+        large = []
+        for local_path, remote_path in _walk_local_files(local_dir, prefix):
+            try:
+                size = os.path.getsize(local_path)
+            except OSError as err:
+                failed[remote_path] = err
+                continue
+            tracker.add_file(size)
+            existing = remote.get(remote_path.lower())
+            if _unchanged_local_file(local_path, existing, hash_cache):
+                skipped.append(existing)
+                tracker.file_done(size)
+                continue
+            commit_info = files.CommitInfo(remote_path, mode=files.WriteMode.overwrite)
+            (large if size >= threshold else small).append((local_path, commit_info, size))
+        lock = threading.Lock()
+
+        def upload_large(item):
+            local_path, commit_info, size = item
+            file_options = UploadOptions(
+                max_attempts=options.max_attempts,
+                parallel_uploads=parallel_uploads,
+                progress=tracker.file_progress(),
+                journal=options.journal,
+            )
+            try:
+                result = self.upload(FileUpload(local_path), commit_info, file_options)
+            except Exception as err:
+                with lock:
+                    failed[commit_info.path] = err
+                tracker.file_done()
+                return
+            with lock:
+                uploaded.append(result.metadata)
+            tracker.file_done()
+
+        with (
+            _reserve_connections(self.client, max_files),
+            futures.ThreadPoolExecutor(max_workers=max_files) as executor,
+        ):
+            pending = [executor.submit(upload_large, item) for item in large]
+            sizes = {}
+            items = []
+            for local_path, commit_info, size in small:
+                # The file may have changed since the walk; only its own
+                # entry fails.
+                try:
+                    items.append((FileUpload(local_path), commit_info))
+                except OSError as err:
+                    with lock:
+                        failed[commit_info.path] = err
+                    tracker.file_done()
+                    continue
+                sizes[commit_info.path] = size
+            if items:
+                batch = BatchUploader(self.client).upload(
+                    items,
+                    BatchUploadOptions(
+                        max_attempts=options.max_attempts,
+                        parallel_uploads=max_files,
+                        batch_size=options.batch_size,
+                    ),
+                )
+                with lock:
+                    uploaded.extend(batch.uploaded.values())
+                    failed.update(batch.failed)
+                for path in batch.uploaded:
+                    tracker.file_done(sizes[path])
+                for path in batch.failed:
+                    tracker.file_done()
+            futures.wait(pending)
+        if hasattr(hash_cache, "save"):
+            hash_cache.save()
+        return TreeUploadResult(uploaded, skipped, failed)
+
+    def _upload_single_request(self, source, size, commit_info, max_attempts, progress):
+        tracker = _ProgressTracker(size, progress, UploadProgress)
+        reader = source.open()
+        try:
+            data, _ = _read_upload_chunk(reader, size + 1)
+        finally:
+            with contextlib.suppress(Exception):
+                reader.close()
+        if len(data) != size:
+            raise TransferError(
+                "read upload content: got {} bytes, expected {}".format(len(data), size)
+            )
+        data_hash = content_hash(data)
+        metadata = _retry_call(
+            max_attempts,
+            self.client.files_upload,
+            data,
+            commit_info.path,
+            mode=commit_info.mode,
+            autorename=commit_info.autorename,
+            client_modified=commit_info.client_modified,
+            mute=commit_info.mute,
+            property_groups=commit_info.property_groups,
+            strict_conflict=commit_info.strict_conflict,
+            content_hash=data_hash,
+        )
+        if metadata is None:
+            raise TransferError("upload metadata is nil")
+        _verify_upload_hash(metadata, data_hash)
+        tracker.add(size)
+        return UploadResult(metadata)
+
+    def _upload_sequential(self, source, commit_info, max_attempts, progress, sizer, journal=None):
         total = source.size() if hasattr(source, "size") else -1
         if total < -1:
             raise TransferError("upload size must not be negative")
         tracker = _ProgressTracker(total, progress, UploadProgress)
-        reader = source.open()
-        try:
-            start = self._start_upload_session(max_attempts)
+        record = None
+        resumed = None
+        if journal is not None:
+            record = {
+                "source": _upload_source_identity(source),
+                "commit": repr(commit_info),
+            }
+            resumed = self._resume_journaled_session(journal, record, commit_info, max_attempts)
+        if resumed is not None:
+            record = resumed
+            session_id = record["session_id"]
+            offset = record["offset"]
+            reader = source.open_range(offset, total - offset)
+            tracker.add(offset)
+        else:
+            session_id = self._start_upload_session(max_attempts).session_id
             offset = 0
+            reader = source.open()
+            if record is not None:
+                record.update(session_id=session_id, offset=0, created=time.time())
+                journal.save(commit_info.path, record)
+        # A resumed upload never reads the committed prefix, so only a fresh
+        # one can check the whole-file hash.
+        hasher = _UploadHasher()
+        verify = offset == 0
+        # Read and hash the next chunk while the current one is being sent.
+        prefetcher = _ChunkPrefetcher(reader, sizer.size, hasher)
+        try:
             while True:
-                chunk, eof = _read_upload_chunk(reader, UPLOAD_CHUNK_SIZE)
+                chunk, chunk_hash, eof = prefetcher.next()
                 if total >= 0 and offset + len(chunk) > total:
                     raise TransferError(
                         "read upload content: got more than declared size {}".format(total)
@@ -619,57 +2021,108 @@ class Uploader(object):
                             )
                         )
                     metadata = self._finish_upload(
-                        start.session_id, offset, commit_info, chunk, max_attempts
+                        session_id, offset, commit_info, chunk, max_attempts, chunk_hash
                     )
                     if metadata is None:
                         raise TransferError("upload metadata is nil")
+                    if verify:
+                        _verify_upload_hash(metadata, hasher.hexdigest())
+                    if journal is not None:
+                        journal.delete(commit_info.path)
                     tracker.add(len(chunk))
                     return UploadResult(metadata)
                 if len(chunk) == 0:
                     raise TransferError("read upload content: no progress")
-                self._append_upload(start.session_id, offset, chunk, False, max_attempts)
+                started = time.monotonic()
+                retries = self._append_upload(
+                    session_id, offset, chunk, False, max_attempts, chunk_hash
+                )
+                sizer.record(len(chunk), time.monotonic() - started, retries)
                 offset += len(chunk)
+                if journal is not None:
+                    record["offset"] = offset
+                    journal.save(commit_info.path, record)
                 tracker.add(len(chunk))
         finally:
-            with contextlib.suppress(Exception):
-                reader.close()
+            prefetcher.close()
 
-    def _upload_parallel(self, source, commit_info, max_attempts, parallel_uploads, progress):
+    def _upload_parallel(
+        self, source, commit_info, max_attempts, parallel_uploads, progress, sizer
+    ):
         size = source.size()
         if size < 0:
             raise TransferError("upload size must not be negative")
         start = self._start_upload_session(max_attempts, concurrent=True)
         tracker = _ProgressTracker(size, progress, UploadProgress)
-        ranges = _split_upload_ranges(size)
+        chunks = (size + sizer.size() - 1) // sizer.size()
+        workers = min(parallel_uploads, max(chunks - 1, 1))
+        # The reader stays at most one queue's depth ahead of the workers, so
+        # about (2 * workers + 1) chunks are held in memory at once.
+        jobs = queue.Queue(maxsize=workers)
         errors = []
+        failed = threading.Event()
         lock = threading.Lock()
-        jobs = ranges[:-1]
-        final_range = ranges[-1] if ranges else None
 
-        def worker(byte_range):
+        def worker():
+            while True:
+                job = jobs.get()
+                if job is None:
+                    return
+                if failed.is_set():
+                    continue
+                byte_range, data, data_hash = job
+                try:
+                    started = time.monotonic()
+                    retries = self._append_upload(
+                        start.session_id, byte_range.offset, data, False, max_attempts, data_hash
+                    )
+                    sizer.record(byte_range.length, time.monotonic() - started, retries)
+                    tracker.add(byte_range.length)
+                except Exception as err:
+                    with lock:
+                        errors.append(err)
+                    failed.set()
+
+        with _reserve_connections(self.client, workers):
+            threads = [threading.Thread(target=worker) for _ in range(workers)]
+            for thread in threads:
+                thread.start()
+            final = None
+            reader = None
+            hasher = _UploadHasher()
             try:
-                self._upload_byte_range(source, start.session_id, byte_range, max_attempts, tracker)
+                reader = source.open_range(0, size)
+                offset = 0
+                while offset < size and not failed.is_set():
+                    length = min(sizer.size(), size - offset)
+                    byte_range = _ByteRange(offset, length, offset + length == size)
+                    data = _read_upload_range(reader, byte_range)
+                    job = (byte_range, data, hasher.chunk_hash(data))
+                    if byte_range.close:
+                        final = job
+                    else:
+                        jobs.put(job)
+                    offset += length
             except Exception as err:
                 with lock:
                     errors.append(err)
-
-        workers = min(parallel_uploads, len(jobs))
-        active = []
-        for byte_range in jobs:
-            thread = threading.Thread(target=worker, args=(byte_range,))
-            active.append(thread)
-            thread.start()
-            if len(active) >= workers:
-                active[0].join()
-                active = active[1:]
-            if errors:
-                break
-        for thread in active:
-            thread.join()
+                failed.set()
+            finally:
+                for _ in threads:
+                    jobs.put(None)
+                for thread in threads:
+                    thread.join()
+                if reader is not None:
+                    with contextlib.suppress(Exception):
+                        reader.close()
         if errors:
             raise errors[0]
-        if final_range is not None:
-            self._upload_byte_range(source, start.session_id, final_range, max_attempts, tracker)
+        if final is not None:
+            byte_range, data, data_hash = final
+            self._append_upload(
+                start.session_id, byte_range.offset, data, True, max_attempts, data_hash
+            )
+            tracker.add(byte_range.length)
         if tracker.committed_bytes() != size:
             raise TransferError(
                 "incomplete upload: committed {} of {} bytes".format(
@@ -679,21 +2132,55 @@ class Uploader(object):
         metadata = self._finish_upload(start.session_id, size, commit_info, b"", max_attempts)
         if metadata is None:
             raise TransferError("upload metadata is nil")
+        _verify_upload_hash(metadata, hasher.hexdigest())
         return UploadResult(metadata)
 
-    def _upload_byte_range(self, source, session_id, byte_range, max_attempts, tracker):
-        reader = source.open_range(byte_range.offset, byte_range.length)
+    def _resume_journaled_session(self, journal, expected, commit_info, max_attempts):
+        record = journal.load(commit_info.path)
+        if not record:
+            return None
         try:
-            data = reader.read()
-        finally:
-            with contextlib.suppress(Exception):
-                reader.close()
-        if len(data) != byte_range.length:
-            raise TransferError(
-                "read upload range: got {} bytes, expected {}".format(len(data), byte_range.length)
+            usable = (
+                record["source"] == expected["source"]
+                and record["commit"] == expected["commit"]
+                and time.time() - float(record["created"]) < UPLOAD_SESSION_RESUME_WINDOW
             )
-        self._append_upload(session_id, byte_range.offset, data, byte_range.close, max_attempts)
-        tracker.add(byte_range.length)
+            session_id = record["session_id"]
+            offset = int(record["offset"])
+        except (KeyError, TypeError, ValueError):
+            usable = False
+        if usable:
+            offset = self._reconcile_upload_offset(session_id, offset, max_attempts)
+            usable = offset is not None and offset <= expected["source"]["size"]
+        if not usable:
+            journal.delete(commit_info.path)
+            return None
+        record["offset"] = offset
+        return record
+
+    def _reconcile_upload_offset(self, session_id, offset, max_attempts):
+        # An empty append at the journaled offset either succeeds or reports
+        # the offset the server has actually committed.
+        last_err = None
+        for attempt in range(max_attempts):
+            try:
+                cursor = files.UploadSessionCursor(session_id, offset)
+                self.client.files_upload_session_append_v2(
+                    b"", cursor, content_hash=content_hash(b"")
+                )
+                return offset
+            except Exception as err:
+                correct_offset = _upload_append_correct_offset(err)
+                if correct_offset is not None:
+                    return correct_offset
+                if _api_endpoint_error(err) is not None:
+                    # Expired, closed or unknown session: start over.
+                    return None
+                if not _is_retryable_transfer_error(err):
+                    raise
+                last_err = err
+                _wait_for_retry(attempt, max_attempts)
+        raise last_err or TransferError("upload session lookup failed")
 
     def _start_upload_session(self, max_attempts, concurrent=False):
         last_err = None
@@ -711,21 +2198,23 @@ class Uploader(object):
                 _wait_for_retry(attempt, max_attempts)
         raise last_err or TransferError("upload session start failed")
 
-    def _append_upload(self, session_id, offset, data, close, max_attempts):
+    def _append_upload(self, session_id, offset, data, close, max_attempts, data_hash=None):
+        if data_hash is None:
+            data_hash = content_hash(data)
         last_err = None
         for attempt in range(max_attempts):
             try:
                 cursor = files.UploadSessionCursor(session_id, offset)
                 self.client.files_upload_session_append_v2(
-                    data, cursor, close=close, content_hash=content_hash(data)
+                    data, cursor, close=close, content_hash=data_hash
                 )
-                return
+                return attempt
             except Exception as err:
                 correct_offset = _upload_append_correct_offset(err)
                 if correct_offset is not None:
                     expected_offset = offset + len(data)
                     if correct_offset == expected_offset:
-                        return
+                        return attempt
                     if correct_offset == offset:
                         last_err = err
                         _wait_for_retry(attempt, max_attempts)
@@ -741,13 +2230,15 @@ class Uploader(object):
                 _wait_for_retry(attempt, max_attempts)
         raise last_err or TransferError("upload append failed")
 
-    def _finish_upload(self, session_id, offset, commit_info, data, max_attempts):
+    def _finish_upload(self, session_id, offset, commit_info, data, max_attempts, data_hash=None):
+        if data_hash is None:
+            data_hash = content_hash(data)
         last_err = None
         for attempt in range(max_attempts):
             try:
                 cursor = files.UploadSessionCursor(session_id, offset)
                 return self.client.files_upload_session_finish(
-                    data, cursor, commit_info, content_hash=content_hash(data)
+                    data, cursor, commit_info, content_hash=data_hash
                 )
             except Exception as err:
                 correct_offset = _upload_finish_correct_offset(err)
@@ -756,6 +2247,7 @@ class Uploader(object):
                     if correct_offset == expected_offset:
                         offset = correct_offset
                         data = b""
+                        data_hash = content_hash(data)
                     elif correct_offset != offset:
                         raise TransferError(
                             "upload session offset mismatch: got {}, expected {} or {}".format(
@@ -772,6 +2264,181 @@ class Uploader(object):
         raise last_err or TransferError("upload finish failed")
 
 
+class BatchUploader(object):
+    """Uploads many files through batched upload sessions.
+
+    Sessions are started with one ``files_upload_session_start_batch`` call
+    per batch of up to 1000 files, file contents are appended in parallel
+    across files, and the whole batch is committed with a single
+    ``files_upload_session_finish_batch_v2`` call. Results are reported per
+    destination path. Files that failed with a transient error, or whose
+    commit was rejected for a retryable reason such as too many write
+    operations, are uploaded again in a later round; the rest of the batch
+    is not. Sources that can only be read once, such as
+    :func:`ReaderUpload`, are reported as failed instead of being retried.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._uploader = Uploader(client)
+
+    def upload(self, items, options=None):
+        """Upload ``items``, an iterable of ``(source, commit_info)`` pairs."""
+        if self.client is None:
+            raise TransferError("upload client is required")
+        options = options or BatchUploadOptions()
+        max_attempts = options.max_attempts if options.max_attempts > 0 else DEFAULT_MAX_ATTEMPTS
+        parallel = options.parallel_uploads
+        if parallel <= 0:
+            parallel = DEFAULT_BATCH_PARALLEL_UPLOADS
+        batch_size = options.batch_size if options.batch_size > 0 else UPLOAD_BATCH_MAX_ENTRIES
+        if batch_size > UPLOAD_BATCH_MAX_ENTRIES:
+            raise TransferError(
+                "upload batch size must not exceed {}".format(UPLOAD_BATCH_MAX_ENTRIES)
+            )
+        pending = []
+        for source, commit_info in items:
+            if source is None:
+                raise TransferError("upload source is required")
+            if not isinstance(commit_info, files.CommitInfo):
+                commit_info = files.CommitInfo(commit_info)
+            if not commit_info.path:
+                raise TransferError("upload destination path is required")
+            pending.append((source, commit_info))
+        uploaded = {}
+        failed = {}
+        retry = []
+        for attempt in range(max_attempts):
+            if attempt > 0:
+                pending = [(source, commit_info) for source, commit_info, _ in retry]
+                if not pending:
+                    break
+                _wait_for_retry(attempt - 1, max_attempts)
+            retry = []
+            with (
+                _reserve_connections(self.client, parallel),
+                futures.ThreadPoolExecutor(max_workers=parallel) as executor,
+            ):
+                for start in range(0, len(pending), batch_size):
+                    batch = pending[start : start + batch_size]
+                    resolved = set()
+                    try:
+                        self._upload_batch(
+                            batch, executor, max_attempts, uploaded, failed, retry, resolved
+                        )
+                    except Exception as err:
+                        # Entries that already succeeded, failed or were queued
+                        # for retry keep that outcome.
+                        for index, (source, commit_info) in enumerate(batch):
+                            if index not in resolved:
+                                _retry_or_fail(source, commit_info, err, retry, failed)
+        for _, commit_info, err in retry:
+            failed[commit_info.path] = err
+        return BatchUploadResult(uploaded, failed)
+
+    def _upload_batch(self, batch, executor, max_attempts, uploaded, failed, retry, resolved):
+        # Adds the index within ``batch`` of every entry it settles, by upload,
+        # failure or retry, to ``resolved``; the caller settles the rest when
+        # the batch as a whole raises.
+        start = _retry_call(max_attempts, self.client.files_upload_session_start_batch, len(batch))
+        session_ids = list(start.session_ids or [])
+        if len(session_ids) != len(batch):
+            raise TransferError(
+                "upload batch started {} sessions, expected {}".format(len(session_ids), len(batch))
+            )
+        uploads = [
+            executor.submit(self._upload_content, session_id, source, max_attempts)
+            for session_id, (source, _) in zip(session_ids, batch)
+        ]
+        entries = []
+        committed = []
+        for index, (session_id, (source, commit_info), upload) in enumerate(
+            zip(session_ids, batch, uploads)
+        ):
+            try:
+                size, file_hash = upload.result()
+            except Exception as err:
+                _retry_or_fail(source, commit_info, err, retry, failed)
+                resolved.add(index)
+                continue
+            cursor = files.UploadSessionCursor(session_id, size)
+            entries.append(files.UploadSessionFinishArg(cursor, commit_info))
+            committed.append((index, source, commit_info, file_hash))
+        if not entries:
+            return
+        results = self._finish_batch(entries, max_attempts)
+        if len(results) != len(entries):
+            raise TransferError(
+                "upload batch returned {} results, expected {}".format(len(results), len(entries))
+            )
+        for (index, source, commit_info, file_hash), result in zip(committed, results):
+            resolved.add(index)
+            if result.is_success():
+                try:
+                    _verify_upload_hash(result.get_success(), file_hash)
+                except ContentHashMismatchError as err:
+                    failed[commit_info.path] = err
+                    continue
+                uploaded[commit_info.path] = result.get_success()
+                failed.pop(commit_info.path, None)
+                continue
+            error = result.get_failure()
+            err = UploadCommitError(commit_info.path, error)
+            if _is_retryable_finish_error(error) and _is_reopenable(source):
+                retry.append((source, commit_info, err))
+            else:
+                failed[commit_info.path] = err
+
+    def _upload_content(self, session_id, source, max_attempts):
+        total = source.size() if hasattr(source, "size") else -1
+        hasher = _UploadHasher()
+        reader = source.open()
+        try:
+            offset = 0
+            while True:
+                chunk, eof = _read_upload_chunk(reader, UPLOAD_CHUNK_SIZE)
+                chunk_hash = hasher.chunk_hash(chunk)
+                if eof:
+                    if total >= 0 and offset + len(chunk) != total:
+                        raise TransferError(
+                            "read upload content: got {} bytes, expected {}".format(
+                                offset + len(chunk), total
+                            )
+                        )
+                    self._uploader._append_upload(
+                        session_id, offset, chunk, True, max_attempts, chunk_hash
+                    )
+                    return offset + len(chunk), hasher.hexdigest()
+                if len(chunk) == 0:
+                    raise TransferError("read upload content: no progress")
+                self._uploader._append_upload(
+                    session_id, offset, chunk, False, max_attempts, chunk_hash
+                )
+                offset += len(chunk)
+        finally:
+            with contextlib.suppress(Exception):
+                reader.close()
+
+    def _finish_batch(self, entries, max_attempts):
+        result = _retry_call(
+            max_attempts, self.client.files_upload_session_finish_batch_v2, entries
+        )
+        return list(result.entries or [])
+
+
+def _is_reopenable(source):
+    # Sources with open_range can be read again from the start; the others
+    # wrap a reader that was consumed by the failed attempt.
+    return hasattr(source, "open_range")
+
+
+def _retry_or_fail(source, commit_info, err, retry, failed):
+    if _is_retryable_transfer_error(err) and _is_reopenable(source):
+        retry.append((source, commit_info, err))
+    else:
+        failed[commit_info.path] = err
+
+
 def download_file(dbx, dropbox_path, local_path, **kwargs):
     return Downloader(dbx).download_file(dropbox_path, local_path, **kwargs)
 
@@ -780,6 +2447,67 @@ def upload_file(dbx, local_path, commit_info, **kwargs):
     return Uploader(dbx).upload_file(local_path, commit_info, **kwargs)
 
 
+def download_tree(dbx, remote_folder, local_dir, options=None):
+    return Downloader(dbx).download_tree(remote_folder, local_dir, options)
+
+
+def upload_tree(dbx, local_dir, remote_folder, options=None):
+    return Uploader(dbx).upload_tree(local_dir, remote_folder, options)
+
+
+class _DownloadAttempts(object):
+    """Retry loop shared by sequential downloads, streams and remote readers.
+
+    ``bodies()`` yields one response body per attempt, each requested from
+    ``offset`` up to ``end`` (the end of the file when None). Consumers
+    advance ``offset`` as they read and set ``last_err`` before asking for
+    the next attempt. Without ``metadata``, the first response sets
+    ``metadata`` and ``info``; every response must describe the same
+    revision.
+    """
+
+    def __init__(
+        self, downloader, remote_path, max_attempts, chunk_size, metadata=None, offset=0, end=None
+    ):
+        self.downloader = downloader
+        self.remote_path = remote_path
+        self.max_attempts = max_attempts
+        self.chunk_size = chunk_size
+        self.metadata = metadata
+        self.info = None
+        self.offset = offset
+        self.end = end
+        self.last_err = None
+
+    def bodies(self):
+        for attempt in range(self.max_attempts):
+            if attempt > 0:
+                _wait_for_retry(attempt - 1, self.max_attempts)
+            try:
+                length = None if self.end is None else self.end - self.offset
+                response_metadata, body = self.downloader._download_range_retryable(
+                    self.remote_path, self.offset, length, self.chunk_size
+                )
+            except Exception as err:
+                if not _is_retryable_transfer_error(err):
+                    raise
+                self.last_err = err
+                continue
+            if body is None:
+                self.last_err = TransferError("download response body is nil")
+                continue
+            try:
+                if self.metadata is None:
+                    self.metadata, self.info = _download_metadata(response_metadata)
+                else:
+                    _validate_download_metadata(self.metadata, response_metadata)
+                yield body
+            finally:
+                with contextlib.suppress(Exception):
+                    body.close()
+        raise self.last_err or TransferError("download failed")
+
+
 class _ProgressTracker(object):
     def __init__(self, total, callback, progress_type):
         self.total = total
@@ -801,6 +2529,194 @@ class _ProgressTracker(object):
             return self.committed
 
 
+_default_hash_cache = LocalHashCache(max_entries=DEFAULT_HASH_CACHE_ENTRIES)
+
+
+class _MemoryTarget(object):
+    accepts_memoryview = True
+
+    def __init__(self, size):
+        self.data = bytearray(size)
+
+    def write_at(self, data, offset):
+        end = offset + len(data)
+        if end > len(self.data):
+            raise IOError("short write")
+        self.data[offset:end] = data
+        return len(data)
+
+
+class _TreeProgressTracker(object):
+    def __init__(self, callback, progress_type=None):
+        self.callback = callback
+        self.progress_type = progress_type or TreeDownloadProgress
+        self.files_completed = 0
+        self.files_total = 0
+        self.committed = 0
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def add_file(self, size):
+        with self.lock:
+            self.files_total += 1
+            self.total += size
+
+    def file_progress(self):
+        last = [0]
+
+        def update(progress):
+            with self.lock:
+                self.committed += progress.bytes_committed - last[0]
+                last[0] = progress.bytes_committed
+                self._report()
+
+        return update
+
+    def file_done(self, skipped_bytes=0):
+        with self.lock:
+            self.files_completed += 1
+            self.committed += skipped_bytes
+            self._report()
+
+    def _report(self):
+        if self.callback:
+            self.callback(
+                self.progress_type(
+                    self.files_completed, self.files_total, self.committed, self.total
+                )
+            )
+
+
+class _ChunkPrefetcher(object):
+    """Reads upload chunks on a background thread, one chunk ahead.
+
+    At most one chunk waits in the queue while the caller sends another, so
+    reading overlaps the network without buffering more than a couple of
+    chunks, and sources need neither a size nor ``open_range``. The
+    prefetcher owns ``reader`` and closes it from its own thread, so the
+    reader is never closed while a read is still in progress.
+    """
+
+    def __init__(self, reader, chunk_size, hasher):
+        self._reader = reader
+        self._chunk_size = chunk_size
+        self._hasher = hasher
+        self._queue = queue.Queue(maxsize=1)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def next(self):
+        chunk, chunk_hash, eof, err = self._queue.get()
+        if err is not None:
+            raise err
+        return chunk, chunk_hash, eof
+
+    def close(self):
+        self._stopped.set()
+        # A read blocked on a slow source may outlive the timeout; the
+        # thread still closes the reader once that read returns.
+        self._thread.join(PREFETCH_CLOSE_TIMEOUT)
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                chunk, eof = _read_upload_chunk(self._reader, self._chunk_size())
+                if not self._put((chunk, self._hasher.chunk_hash(chunk), eof, None)) or eof:
+                    return
+        except Exception as err:
+            self._put((None, None, True, err))
+        finally:
+            with contextlib.suppress(Exception):
+                self._reader.close()
+
+    def _put(self, item):
+        # Wait for the queue slot in short steps so that a closed prefetcher
+        # stops without handing over another chunk.
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=PREFETCH_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+
+class _UploadHasher(object):
+    """Hashes upload content once for both its chunks and the whole file.
+
+    Chunks are fed in order. A chunk that starts on a 4 MiB block boundary
+    has its content hash folded from the same block digests that make up the
+    whole-file hash, so each byte is hashed once. Chunks that start inside a
+    block only happen with unaligned chunk sizes and are hashed separately.
+    """
+
+    def __init__(self):
+        self._block_size = DropboxContentHasher.BLOCK_SIZE
+        self._digests = []
+        self._block = hashlib.sha256()
+        self._block_pos = 0
+
+    def chunk_hash(self, data):
+        aligned = self._block_pos == 0
+        first = len(self._digests)
+        view = memoryview(data)
+        pos = 0
+        while pos < len(view):
+            take = min(self._block_size - self._block_pos, len(view) - pos)
+            self._block.update(view[pos : pos + take])
+            self._block_pos += take
+            pos += take
+            if self._block_pos == self._block_size:
+                self._digests.append(self._block.digest())
+                self._block = hashlib.sha256()
+                self._block_pos = 0
+        if not aligned:
+            return content_hash(data)
+        return _fold_block_hashes(self._digests[first:] + self._pending_digest())
+
+    def hexdigest(self):
+        return _fold_block_hashes(self._digests + self._pending_digest())
+
+    def _pending_digest(self):
+        return [self._block.digest()] if self._block_pos else []
+
+
+class _ChunkSizer(object):
+    """Picks the size of the next upload chunk.
+
+    A fixed sizer always returns its initial size. An adaptive sizer aims
+    for appends that take about ``UPLOAD_TARGET_APPEND_SECONDS`` at the
+    measured throughput, changing by at most a factor of two per append, and
+    halves the size after an append that needed retries. Sizes stay
+    multiples of ``UPLOAD_CHUNK_ALIGNMENT`` so concurrent sessions accept
+    them.
+    """
+
+    def __init__(self, initial, adaptive=False):
+        self._size = initial
+        self._adaptive = adaptive
+        self._lock = threading.Lock()
+
+    def size(self):
+        with self._lock:
+            return self._size
+
+    def record(self, length, seconds, retries):
+        if not self._adaptive or length <= 0:
+            return
+        with self._lock:
+            if retries:
+                target = self._size // 2
+            elif seconds <= 0:
+                target = self._size * 2
+            else:
+                target = int(length / seconds * UPLOAD_TARGET_APPEND_SECONDS)
+                target = max(self._size // 2, min(target, self._size * 2))
+            target -= target % UPLOAD_CHUNK_ALIGNMENT
+            self._size = max(UPLOAD_CHUNK_ALIGNMENT, min(target, UPLOAD_MAX_CHUNK_SIZE))
+
+
 @dataclass(frozen=True)
 class _ByteRange:
     offset: int
@@ -808,6 +2724,176 @@ class _ByteRange:
     close: bool = False
 
 
+class _DownloadHasher(object):
+    """Computes a download's content hash from blocks as they are written.
+
+    Each 4 MiB Dropbox block is hashed as soon as its bytes have been written
+    front to back, so commit only folds the block digests in order. Writes
+    that land ahead of a block's hash position are read back through
+    ``read_at`` once the gap before them is filled, and blocks that were never
+    hashed as they were written (for example ranges restored from a resume
+    journal, or bytes written twice) are read back in :meth:`hexdigest`.
+    Each block has its own lock, so workers writing different blocks hash
+    concurrently.
+    """
+
+    def __init__(self, size, read_at):
+        self._size = size
+        self._read_at = read_at
+        self._block_size = DropboxContentHasher.BLOCK_SIZE
+        self._lock = threading.Lock()
+        self._digests = [None] * ((size + self._block_size - 1) // self._block_size)
+        self._blocks = {}
+        self._stale = set()
+
+    def update(self, offset, data):
+        view = memoryview(data)
+        pos = 0
+        while pos < len(view):
+            index = (offset + pos) // self._block_size
+            block_start = index * self._block_size
+            block_end = min(block_start + self._block_size, self._size)
+            count = min(len(view) - pos, block_end - (offset + pos))
+            self._update_block(index, offset + pos - block_start, view[pos : pos + count])
+            pos += count
+
+    def hexdigest(self):
+        overall = hashlib.sha256()
+        with self._lock:
+            digests = list(self._digests)
+        for index, digest in enumerate(digests):
+            if digest is None:
+                block_start = index * self._block_size
+                length = min(self._block_size, self._size - block_start)
+                digest = hashlib.sha256(self._read_at(block_start, length)).digest()
+            overall.update(digest)
+        return overall.hexdigest()
+
+    def _update_block(self, index, start, data):
+        with self._lock:
+            if index in self._stale:
+                return
+            state = self._blocks.get(index)
+            if state is None:
+                if self._digests[index] is not None:
+                    self._mark_stale(index)
+                    return
+                state = self._blocks[index] = _BlockHashState(hashlib.sha256())
+        with state.lock:
+            if start < state.position:
+                with self._lock:
+                    self._mark_stale(index)
+                return
+            if start > state.position:
+                state.pending = _add_range(state.pending, start, len(data))
+                return
+            state.hasher.update(data)
+            state.position += len(data)
+            block_start = index * self._block_size
+            while state.pending and state.pending[0].offset <= state.position:
+                byte_range = state.pending.pop(0)
+                end = byte_range.offset + byte_range.length
+                if end > state.position:
+                    state.hasher.update(
+                        self._read_at(block_start + state.position, end - state.position)
+                    )
+                    state.position = end
+            if state.position == min(self._block_size, self._size - block_start):
+                with self._lock:
+                    if index not in self._stale:
+                        self._digests[index] = state.hasher.digest()
+                        del self._blocks[index]
+
+    def _mark_stale(self, index):
+        self._stale.add(index)
+        self._digests[index] = None
+        self._blocks.pop(index, None)
+
+
+class _BlockHashState(object):
+    def __init__(self, hasher):
+        self.lock = threading.Lock()
+        self.hasher = hasher
+        self.position = 0
+        self.pending = []
+
+
+class _RangeTask(object):
+    def __init__(self, offset, end):
+        self.offset = offset
+        self.end = end
+        self.reserved = offset
+
+
+class _RangeScheduler(object):
+    """Hands out download ranges to a pool of workers.
+
+    The missing bytes are cut into ``range_size`` pieces aligned to
+    ``alignment`` and queued. Once the queue is empty, an idle worker splits
+    the unreserved tail of the largest in-flight range at an aligned offset
+    and takes the second half, so a slow connection does not hold up the
+    whole download. Workers reserve each chunk before reading it, which keeps
+    a split from handing out bytes its original owner is already copying.
+    """
+
+    def __init__(self, ranges, range_size, alignment):
+        self._lock = threading.Lock()
+        self._alignment = alignment
+        self._queue = collections.deque()
+        self._active = set()
+        self._failed = False
+        for byte_range in ranges:
+            offset = byte_range.offset
+            end = byte_range.offset + byte_range.length
+            while offset < end:
+                piece_end = min(end, (offset // range_size + 1) * range_size)
+                self._queue.append(_RangeTask(offset, piece_end))
+                offset = piece_end
+
+    def next_task(self):
+        with self._lock:
+            if self._failed:
+                return None
+            if self._queue:
+                task = self._queue.popleft()
+            else:
+                task = self._steal()
+            if task is not None:
+                self._active.add(task)
+            return task
+
+    def reserve(self, task, offset, size):
+        with self._lock:
+            count = max(0, min(size, task.end - offset))
+            task.reserved = max(task.reserved, offset + count)
+            return count
+
+    def finish(self, task):
+        with self._lock:
+            self._active.discard(task)
+
+    def fail(self):
+        with self._lock:
+            self._failed = True
+
+    def _steal(self):
+        victim = None
+        victim_split = None
+        for task in self._active:
+            midpoint = task.reserved + (task.end - task.reserved) // 2
+            split = -(-midpoint // self._alignment) * self._alignment
+            if split <= task.reserved or split >= task.end:
+                continue
+            if victim is None or task.end - split > victim.end - victim_split:
+                victim = task
+                victim_split = split
+        if victim is None:
+            return None
+        stolen = _RangeTask(victim_split, victim.end)
+        victim.end = victim_split
+        return stolen
+
+
 class _SectionReader(object):
     def __init__(self, f, offset, length):
         self._file = f
@@ -827,6 +2913,23 @@ class _SectionReader(object):
         return self._file.close()
 
 
+class _BufferReader(object):
+    def __init__(self, view):
+        self._view = view
+        self._pos = 0
+
+    def read(self, size=-1):
+        remaining = len(self._view) - self._pos
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = self._view[self._pos : self._pos + size]
+        self._pos += size
+        return data
+
+    def close(self):
+        self._view = memoryview(b"")
+
+
 class _ReaderCloser(object):
     def __init__(self, reader):
         self._reader = reader
@@ -840,29 +2943,84 @@ class _ReaderCloser(object):
             return close()
 
 
+class _ReleasingReader(object):
+    """Wraps a response body and runs ``release`` once when it is closed."""
+
+    def __init__(self, reader, release):
+        self._reader = reader
+        self._release = release
+        self._released = False
+        self._lock = threading.Lock()
+        if hasattr(reader, "readinto"):
+            self.readinto = reader.readinto
+
+    def read(self, size=-1):
+        return self._reader.read(size)
+
+    def close(self):
+        try:
+            close = getattr(self._reader, "close", None)
+            if close:
+                return close()
+        finally:
+            with self._lock:
+                released = self._released
+                self._released = True
+            if not released:
+                self._release()
+
+
 class _ResponseReader(object):
-    def __init__(self, response):
+    """File-like view of a streamed ``requests`` response.
+
+    Uncompressed bodies are read straight from the urllib3 response with
+    ``readinto``; otherwise ``iter_content`` chunks are handed out as they
+    arrive, sliced only when a caller asks for less than a whole chunk.
+    """
+
+    def __init__(self, response, chunk_size=DOWNLOAD_CHUNK_SIZE):
         self._response = response
-        self._iterator = response.iter_content(DOWNLOAD_CHUNK_SIZE)
-        self._buffer = bytearray()
+        self._raw = None
+        self._iterator = None
+        raw = getattr(response, "raw", None)
+        encoding = getattr(response, "headers", None) or {}
+        encoding = encoding.get("Content-Encoding", "identity").strip().lower()
+        if hasattr(raw, "readinto") and encoding in ("", "identity"):
+            self._raw = raw
+        else:
+            self._iterator = response.iter_content(chunk_size)
+        self._chunk = b""
+        self._pos = 0
 
     def read(self, size=-1):
+        if self._raw is not None:
+            if size is None or size < 0:
+                return self._raw.read()
+            return self._raw.read(size)
         if size is None or size < 0:
-            chunks = [bytes(self._buffer)]
-            self._buffer.clear()
+            chunks = [self._chunk[self._pos :]]
+            self._chunk = b""
+            self._pos = 0
             chunks.extend(chunk for chunk in self._iterator if chunk)
             return b"".join(chunks)
-        while len(self._buffer) < size:
-            try:
-                chunk = next(self._iterator)
-            except StopIteration:
-                break
-            if chunk:
-                self._buffer.extend(chunk)
-        data = bytes(self._buffer[:size])
-        del self._buffer[:size]
+        if self._pos >= len(self._chunk):
+            self._chunk = next((chunk for chunk in self._iterator if chunk), b"")
+            self._pos = 0
+        if self._pos == 0 and size >= len(self._chunk):
+            data = self._chunk
+            self._chunk = b""
+            return data
+        data = self._chunk[self._pos : self._pos + size]
+        self._pos += len(data)
         return data
 
+    def readinto(self, buffer):
+        if self._raw is not None:
+            return self._raw.readinto(buffer)
+        data = self.read(len(buffer))
+        memoryview(buffer)[: len(data)] = data
+        return len(data)
+
     def close(self):
         return self._response.close()
 
@@ -870,7 +3028,192 @@ class _ResponseReader(object):
 def _download_metadata(metadata):
     if metadata is None:
         raise TransferError("download metadata is nil")
-    return metadata, DownloadInfo(int(metadata.size), getattr(metadata, "content_hash", None))
+    return metadata, DownloadInfo(
+        int(metadata.size),
+        getattr(metadata, "content_hash", None),
+        getattr(metadata, "rev", None),
+    )
+
+
+def _reserve_connections(client, count):
+    # Clients backed by an SDK session grow their connection pool while a
+    # transfer runs, by one connection per worker thread of the transfer.
+    reserve = getattr(client, "reserve_connections", None)
+    if reserve is None:
+        return contextlib.nullcontext()
+    return reserve(count)
+
+
+def _list_folder_files(client, path, max_attempts):
+    max_attempts = max_attempts if max_attempts > 0 else DEFAULT_MAX_ATTEMPTS
+    result = _retry_call(
+        max_attempts,
+        client.files_list_folder,
+        path,
+        recursive=True,
+        include_non_downloadable_files=False,
+    )
+    while True:
+        for entry in result.entries:
+            yield entry
+        if not result.has_more:
+            return
+        result = _retry_call(max_attempts, client.files_list_folder_continue, result.cursor)
+
+
+def _list_remote_files(client, path, max_attempts):
+    remote = {}
+    try:
+        for entry in _list_folder_files(client, path, max_attempts):
+            if isinstance(entry, files.FileMetadata):
+                remote[entry.path_lower] = entry
+    except ApiError as err:
+        error = err.error
+        if not (error.is_path() and error.get_path().is_not_found()):
+            raise
+    return remote
+
+
+def _walk_local_files(local_dir, prefix):
+    for root, dirs, names in os.walk(local_dir):
+        dirs.sort()
+        relative = os.path.relpath(root, local_dir)
+        parts = [] if relative == os.curdir else relative.split(os.sep)
+        for name in sorted(names):
+            local_path = os.path.join(root, name)
+            if os.path.isfile(local_path):
+                yield local_path, "/".join([prefix] + parts + [name])
+
+
+def _tree_local_path(local_dir, prefix, path_display):
+    relative = path_display[len(prefix) :].strip("/")
+    if not relative:
+        return local_dir
+    parts = relative.split("/")
+    if any(part in ("", ".", "..") for part in parts):
+        raise TransferError("unsafe remote path: {}".format(path_display))
+    return os.path.join(local_dir, *parts)
+
+
+def _target_path(target):
+    return getattr(target, "path", None)
+
+
+def _unchanged_local_file(local_path, metadata, hash_cache):
+    expected = getattr(metadata, "content_hash", None)
+    if hash_cache is None or not local_path or not expected:
+        return False
+    try:
+        if not os.path.isfile(local_path) or os.path.getsize(local_path) != int(metadata.size):
+            return False
+        return hash_cache.content_hash(local_path) == expected
+    except OSError:
+        return False
+
+
+def _seed_from_local_file(path, target, offset, size):
+    """Copy the local file's bytes past ``offset`` into ``target`` when the
+    remote file is larger, on the assumption that it only grew.
+
+    Dropbox does not expose per-block hashes of the remote file, so changed
+    blocks cannot be found ahead of time. Appended-to files (logs, growing
+    dumps) are the case where the old copy is a usable prefix. Callers only
+    seed targets that check the content hash at commit, which catches every
+    other case.
+    """
+    try:
+        local_size = os.path.getsize(path)
+    except OSError:
+        return 0
+    if local_size >= size or local_size <= offset:
+        return 0
+    seeded = 0
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while offset + seeded < local_size:
+            chunk = f.read(min(DropboxContentHasher.BLOCK_SIZE, local_size - offset - seeded))
+            if not chunk:
+                break
+            while chunk:
+                count = target.write_at(chunk, offset + seeded)
+                if count <= 0:
+                    raise IOError("no progress")
+                chunk = chunk[count:]
+                seeded += count
+    return seeded
+
+
+def _block_cache_name(block_size, key):
+    return hashlib.sha256(json.dumps([block_size] + list(key)).encode("utf-8")).hexdigest()
+
+
+def _file_identity(stat):
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def _recently_modified(stat):
+    return time.time() - stat.st_mtime < 2
+
+
+def _hash_local_file(path):
+    return _read_file_hasher(path).hexdigest()
+
+
+def _hash_indexed_file(path):
+    # Returns (stat, content hash, block digests, cacheable); the result is
+    # not cacheable when the file changed while it was read or was modified
+    # too recently to trust its timestamp.
+    stat = os.stat(path)
+    hasher = _read_file_hasher(path)
+    unchanged = _file_identity(os.stat(path)) == _file_identity(stat)
+    digests = hasher.block_digests()
+    return stat, hasher.hexdigest(), digests, unchanged and not _recently_modified(stat)
+
+
+def _read_file_hasher(path):
+    # Streams the file instead of mapping it: a file truncated while it is
+    # mapped faults the process rather than raising an error.
+    hasher = DropboxContentHasher()
+    buffer = bytearray(DropboxContentHasher.BLOCK_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb") as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            hasher.update(view[:count])
+    return hasher
+
+
+def _target_resume_ranges(target):
+    resume_ranges = getattr(target, "resume_ranges", None)
+    if resume_ranges is None:
+        return []
+    return resume_ranges()
+
+
+def _read_download_journal(path):
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+        info = DownloadInfo(int(state["size"]), state.get("content_hash"), state.get("rev"))
+        ranges = [_ByteRange(int(offset), int(length)) for offset, length in state["ranges"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return info, ranges
+
+
+def _write_download_journal(path, info, ranges):
+    state = {
+        "size": info.size,
+        "rev": info.rev,
+        "content_hash": info.content_hash,
+        "ranges": [[r.offset, r.length] for r in ranges],
+    }
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(temp_path, path)
 
 
 def _validate_download_metadata(expected, actual):
@@ -902,14 +3245,27 @@ def _validate_download_metadata(expected, actual):
         )
 
 
-def _copy_download_range(reader, target, offset, length, progress):
+def _copy_download_range(
+    reader, target, offset, length, progress, reserve=None, chunk_size=DOWNLOAD_CHUNK_SIZE
+):
     if length < 0:
         return 0, TransferError("download range length must not be negative"), False
+    buffer = None
+    if hasattr(reader, "readinto") and getattr(target, "accepts_memoryview", False):
+        buffer = memoryview(bytearray(min(chunk_size, length) or 1))
     written = 0
     while written < length:
-        remaining = length - written
+        size = min(chunk_size, length - written)
+        if reserve is not None:
+            size = reserve(offset + written, size)
+            if size <= 0:
+                # The rest of the range was handed to another worker.
+                return written, None, False
         try:
-            chunk = reader.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if buffer is not None:
+                chunk = buffer[: reader.readinto(buffer[:size]) or 0]
+            else:
+                chunk = reader.read(size)
         except Exception as err:
             return written, err, True
         if not chunk:
@@ -936,33 +3292,86 @@ def _copy_download_range(reader, target, offset, length, progress):
     return written, None, False
 
 
-def _split_ranges(offset, length, parts):
+def _add_range(ranges, offset, length):
     if length <= 0:
-        return []
-    if parts <= 1:
-        return [_ByteRange(offset, length)]
-    parts = min(parts, length)
-    part_size = length // parts
-    remainder = length % parts
-    ranges = []
-    for index in range(parts):
-        size = part_size + (1 if index < remainder else 0)
-        ranges.append(_ByteRange(offset, size))
-        offset += size
-    return ranges
-
-
-def _split_upload_ranges(size):
-    if size == 0:
-        return []
-    ranges = []
+        return list(ranges)
+    start = offset
+    end = offset + length
+    merged = []
+    for byte_range in ranges:
+        range_end = byte_range.offset + byte_range.length
+        if range_end < start or byte_range.offset > end:
+            merged.append(byte_range)
+        else:
+            start = min(start, byte_range.offset)
+            end = max(end, range_end)
+    merged.append(_ByteRange(start, end - start))
+    merged.sort(key=lambda r: r.offset)
+    return merged
+
+
+def _missing_ranges(covered, size):
+    missing = []
     offset = 0
-    while offset < size:
-        length = min(UPLOAD_CHUNK_SIZE, size - offset)
-        ranges.append(_ByteRange(offset, length))
-        offset += length
-    ranges[-1] = _ByteRange(ranges[-1].offset, ranges[-1].length, True)
-    return ranges
+    for byte_range in covered:
+        if byte_range.offset > offset:
+            missing.append(_ByteRange(offset, byte_range.offset - offset))
+        offset = max(offset, byte_range.offset + byte_range.length)
+    if offset < size:
+        missing.append(_ByteRange(offset, size - offset))
+    return missing
+
+
+def _upload_chunk_sizer(options):
+    if options.chunk_size < 0:
+        raise TransferError("upload chunk size must not be negative")
+    if options.chunk_size > UPLOAD_MAX_CHUNK_SIZE:
+        raise TransferError(
+            "upload chunk size must not exceed {} bytes".format(UPLOAD_MAX_CHUNK_SIZE)
+        )
+    chunk_size = options.chunk_size if options.chunk_size > 0 else UPLOAD_CHUNK_SIZE
+    return _ChunkSizer(chunk_size, options.adaptive_chunk_size)
+
+
+def _upload_source_identity(source):
+    size = source.size()
+    identity = {"size": size}
+    path = getattr(source, "path", None)
+    if path is not None:
+        identity["path"] = os.path.abspath(path)
+        identity["mtime_ns"] = os.stat(path).st_mtime_ns
+    # Hash the head and tail of the content so an edited file is noticed
+    # even when its size and modification time were preserved.
+    hasher = hashlib.sha256()
+    head = min(size, UPLOAD_IDENTITY_SAMPLE_BYTES)
+    tail_offset = max(head, size - UPLOAD_IDENTITY_SAMPLE_BYTES)
+    for offset, length in ((0, head), (tail_offset, size - tail_offset)):
+        reader = source.open_range(offset, length)
+        try:
+            data, _ = _read_upload_chunk(reader, length + 1)
+        finally:
+            with contextlib.suppress(Exception):
+                reader.close()
+        hasher.update(data)
+    identity["sample_hash"] = hasher.hexdigest()
+    return identity
+
+
+def _verify_upload_hash(metadata, expected):
+    actual = getattr(metadata, "content_hash", None)
+    if expected and actual and actual != expected:
+        raise ContentHashMismatchError(
+            'upload content hash mismatch: got "{}", expected "{}"'.format(actual, expected)
+        )
+
+
+def _single_request_threshold(options):
+    threshold = options.single_request_threshold or UPLOAD_SINGLE_REQUEST_THRESHOLD
+    if threshold > UPLOAD_MAX_CHUNK_SIZE:
+        raise TransferError(
+            "single request upload threshold must not exceed {} bytes".format(UPLOAD_MAX_CHUNK_SIZE)
+        )
+    return threshold
 
 
 def _read_upload_chunk(reader, limit):
@@ -974,11 +3383,28 @@ def _read_upload_chunk(reader, limit):
         data = reader.read(limit - total)
         if data is None:
             data = b""
-        if not data:
-            return b"".join(chunks), True
+        if not len(data):
+            return _join_upload_chunks(chunks), True
         chunks.append(data)
         total += len(data)
-    return b"".join(chunks), False
+    return _join_upload_chunks(chunks), False
+
+
+def _join_upload_chunks(chunks):
+    # A chunk read in one piece is passed on as is, which keeps memoryview
+    # slices of mapped sources from being copied.
+    if len(chunks) == 1:
+        return chunks[0]
+    return b"".join(chunks)
+
+
+def _read_upload_range(reader, byte_range):
+    data, _ = _read_upload_chunk(reader, byte_range.length)
+    if len(data) != byte_range.length:
+        raise TransferError(
+            "read upload range: got {} bytes, expected {}".format(len(data), byte_range.length)
+        )
+    return data
 
 
 def _validate_range(size, offset, length):
@@ -994,6 +3420,19 @@ def _validate_range(size, offset, length):
         )
 
 
+def _retry_call(max_attempts, func, *args, **kwargs):
+    last_err = None
+    for attempt in range(max_attempts):
+        try:
+            return func(*args, **kwargs)
+        except Exception as err:
+            if not _is_retryable_transfer_error(err):
+                raise
+            last_err = err
+            _wait_for_retry(attempt, max_attempts)
+    raise last_err
+
+
 def _wait_for_retry(attempt, max_attempts):
     if attempt + 1 >= max_attempts:
         return
@@ -1019,6 +3458,15 @@ def _is_retryable_transfer_error(err):
     return isinstance(err, (ConnectionError,))
 
 
+def _is_retryable_finish_error(error):
+    if error.is_too_many_write_operations() or error.is_content_hash_mismatch():
+        return True
+    if error.is_lookup_failed():
+        # The session was lost or left in a bad state; a fresh one will do.
+        return True
+    return error.is_path() and error.get_path().is_too_many_write_operations()
+
+
 def _upload_append_correct_offset(err):
     endpoint = _api_endpoint_error(err)
     if endpoint is not None and getattr(endpoint, "is_incorrect_offset", lambda: False)():
@@ -1045,7 +3493,7 @@ def _is_unsatisfiable_initial_range(err):
     return isinstance(err, ApiError) and "range/not_satisfiable" in repr(err.error)
 
 
-def _files_download_range(dbx, dropbox_path, offset, length=None):
+def _files_download_range(dbx, dropbox_path, offset, length=None, chunk_size=DOWNLOAD_CHUNK_SIZE):
     range_header = "bytes={}-".format(offset)
     if length is not None:
         range_header = "bytes={}-{}".format(offset, offset + length - 1)
@@ -1053,12 +3501,12 @@ def _files_download_range(dbx, dropbox_path, offset, length=None):
         dropbox_path,
         extra_headers={"Range": range_header},
     )
-    return metadata, _readable_response(body)
+    return metadata, _readable_response(body, chunk_size)
 
 
-def _readable_response(body):
+def _readable_response(body, chunk_size=DOWNLOAD_CHUNK_SIZE):
     if hasattr(body, "read"):
         return body
     if hasattr(body, "iter_content"):
-        return _ResponseReader(body)
+        return _ResponseReader(body, chunk_size)
     return body
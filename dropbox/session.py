@@ -1,8 +1,13 @@
+import contextlib
 import os
 import ssl
+import threading
+from dataclasses import dataclass
+from http.cookiejar import DefaultCookiePolicy
 
 import requests
 from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPSConnectionPool
 from urllib3.poolmanager import PoolManager
 
 API_DOMAIN = os.environ.get(
@@ -31,18 +36,133 @@ WEB_HOST = os.environ.get("DROPBOX_WEB_HOST", HOST_WWW + WEB_DOMAIN)
 # This is the default longest time we'll block on receiving data from the server
 DEFAULT_TIMEOUT = 100
 
+# Default number of pooled connections kept per host.
+DEFAULT_POOL_MAXSIZE = 8
+
+
+@dataclass(frozen=True)
+class PoolStats:
+    """Connection pool counters of a session, summed over its hosts.
+
+    ``saturated`` counts requests that found every pooled connection for
+    their host in use and had to open an extra one; ``discarded`` counts
+    those extra connections closed afterwards because the pool was full.
+    Both growing steadily means requests are waiting on TLS handshakes and
+    the pool should be larger.
+    """
+
+    max_connections: int
+    reserved: int
+    checkouts: int
+    saturated: int
+    discarded: int
+
+
+class _PoolCounters(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.saturated = 0
+        self.discarded = 0
+
+    def checkout(self, saturated):
+        with self.lock:
+            self.checkouts += 1
+            self.saturated += int(saturated)
+
+    def discard(self):
+        with self.lock:
+            self.discarded += 1
+
+
+class _MeteredHTTPSConnectionPool(HTTPSConnectionPool):
+    counters = None
+
+    def _get_conn(self, timeout=None):
+        if self.counters is not None and self.pool is not None:
+            self.counters.checkout(self.pool.empty())
+        return super(_MeteredHTTPSConnectionPool, self)._get_conn(timeout)
+
+    def _put_conn(self, conn):
+        if self.counters is not None and self.pool is not None and self.pool.full():
+            self.counters.discard()
+        super(_MeteredHTTPSConnectionPool, self)._put_conn(conn)
+
+    def resize(self, maxsize):
+        # urllib3 fills the pool queue with None placeholders that stand for
+        # connections not opened yet. Growing the pool adds placeholders;
+        # shrinking it drops placeholders first and then the least recently
+        # used idle connections, so warm connections are kept. Connections
+        # checked out while the pool shrinks are discarded when they come
+        # back to a full pool.
+        pool = self.pool
+        if pool is None:
+            return
+        stale = []
+        with pool.mutex:
+            extra = maxsize - pool.maxsize
+            pool.maxsize = maxsize
+            # LifoQueue keeps its items in a list, most recently returned last.
+            items = pool.queue
+            if extra > 0:
+                items.extend([None] * extra)
+                pool.not_empty.notify(extra)
+            while len(items) > maxsize and None in items:
+                items.remove(None)
+            while len(items) > maxsize:
+                stale.append(items.pop(0))
+        for conn in stale:
+            conn.close()
+
+
+class _MeteredPoolManager(PoolManager):
+    """Pool manager whose HTTPS pools can be resized in place.
+
+    The pool size is kept out of ``connection_pool_kw``, which is part of
+    urllib3's pool key, so a resize never sends requests to a new pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(_MeteredPoolManager, self).__init__(*args, **kwargs)
+        self.counters = _PoolCounters()
+        self.maxsize = self.connection_pool_kw.get("maxsize", 1)
+        self.pool_classes_by_scheme = dict(
+            self.pool_classes_by_scheme, https=_MeteredHTTPSConnectionPool
+        )
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        # Called with the pools lock held, so it sees the size set by resize.
+        request_context = dict(request_context or self.connection_pool_kw, maxsize=self.maxsize)
+        pool = super(_MeteredPoolManager, self)._new_pool(scheme, host, port, request_context)
+        pool.counters = self.counters
+        return pool
+
+    def resize(self, maxsize):
+        with self.pools.lock:
+            self.maxsize = maxsize
+            for key in self.pools.keys():
+                pool = self.pools.get(key)
+                if isinstance(pool, _MeteredHTTPSConnectionPool):
+                    pool.resize(maxsize)
+
 
-# TODO(kelkabany): We probably only want to instantiate this once so that even
-# if multiple Dropbox objects are instantiated, they all share the same pool.
 class _SSLAdapter(HTTPAdapter):
     _ca_certs = None
 
     def __init__(self, *args, **kwargs):
         self._ca_certs = kwargs.pop("ca_certs", None)
+        self._reserve_lock = threading.Lock()
+        self._reserved = 0
         super(_SSLAdapter, self).__init__(*args, **kwargs)
 
+    def __setstate__(self, state):
+        # HTTPAdapter only pickles its own attributes.
+        self._reserve_lock = threading.Lock()
+        self._reserved = 0
+        super(_SSLAdapter, self).__setstate__(state)
+
     def init_poolmanager(self, connections, maxsize, block=False, **_):
-        self.poolmanager = PoolManager(
+        self.poolmanager = _MeteredPoolManager(
             num_pools=connections,
             maxsize=maxsize,
             block=block,
@@ -50,8 +170,32 @@ class _SSLAdapter(HTTPAdapter):
             ca_certs=self._ca_certs,
         )
 
+    def reserve(self, count):
+        self._resize(count)
+
+    def release(self, count):
+        self._resize(-count)
+
+    def _resize(self, delta):
+        # _pool_maxsize stays the base size; it also sizes proxy managers and
+        # the pool manager rebuilt after unpickling.
+        with self._reserve_lock:
+            self._reserved += delta
+            self.poolmanager.resize(self._pool_maxsize + self._reserved)
+
+    def stats(self):
+        counters = self.poolmanager.counters
+        with self._reserve_lock, counters.lock:
+            return PoolStats(
+                self._pool_maxsize + self._reserved,
+                self._reserved,
+                counters.checkouts,
+                counters.saturated,
+                counters.discarded,
+            )
 
-def pinned_session(pool_maxsize=8, ca_certs=None):
+
+def pinned_session(pool_maxsize=DEFAULT_POOL_MAXSIZE, ca_certs=None):
     # always verify, use cert bundle if provided
 
     _session = requests.session()
@@ -68,4 +212,75 @@ def pinned_session(pool_maxsize=8, ca_certs=None):
     return _session
 
 
+_shared_sessions = {}
+_shared_sessions_lock = threading.Lock()
+
+
+def shared_session(ca_certs=None):
+    """
+    Returns the process-wide session used by clients created without an
+    explicit session, one per CA bundle. Its urllib3 pool manager keeps a
+    separate pool per host, so every client in the process reuses warm TLS
+    connections to the API and content hosts. Cookies are never stored, so
+    clients for different accounts cannot leak state to each other. A forked
+    child process starts with new shared sessions.
+    """
+    with _shared_sessions_lock:
+        session = _shared_sessions.get(ca_certs)
+        if session is None:
+            session = pinned_session(ca_certs=ca_certs)
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            _shared_sessions[ca_certs] = session
+        return session
+
+
+def _forget_shared_sessions():
+    # A forked child must not write to the sockets pooled by its parent, and
+    # the lock may have been held by a parent thread at the time of the fork.
+    global _shared_sessions, _shared_sessions_lock
+    _shared_sessions = {}
+    _shared_sessions_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_shared_sessions)
+
+
+def is_shared_session(session):
+    with _shared_sessions_lock:
+        return any(shared is session for shared in _shared_sessions.values())
+
+
+@contextlib.contextmanager
+def reserve_connections(session, count):
+    """
+    Grows the per-host pools of ``session`` by ``count`` connections for the
+    duration of the block, so ``count`` concurrent transfer threads each get a
+    pooled connection on top of the default pool size. Pools are resized in
+    place and keep their warm connections. Reservations from concurrent
+    transfers add up, and the pools shrink back once they end. Sessions not
+    created by this module are left as they are.
+    """
+    adapter = session.get_adapter("https://")
+    if count <= 0 or not isinstance(adapter, _SSLAdapter):
+        yield
+        return
+    adapter.reserve(count)
+    try:
+        yield
+    finally:
+        adapter.release(count)
+
+
+def pool_stats(session):
+    """
+    Returns the :class:`PoolStats` of ``session``, or None when it was not
+    created by this module.
+    """
+    adapter = session.get_adapter("https://")
+    if not isinstance(adapter, _SSLAdapter):
+        return None
+    return adapter.stats()
+
+
 SSLError = requests.exceptions.SSLError  # raised on verification errors
@@ -2,6 +2,7 @@
 
 import hashlib
 import io
+import json
 
 import pytest
 
@@ -9,6 +10,7 @@ from dropbox.content_hash import (
     DropboxContentHasher,
     StreamHasher,
     content_hash,
+    parallel_content_hash,
 )
 
 BLOCK_SIZE = DropboxContentHasher.BLOCK_SIZE
@@ -56,11 +58,26 @@ class TestContentHash:
         h2.update(data)
         assert h1.digest().hex() == h2.hexdigest()
 
-    def test_update_rejects_non_bytes(self):
+    def test_update_rejects_str(self):
         hasher = DropboxContentHasher()
         with pytest.raises(AssertionError):
             hasher.update("not bytes")
 
+    def test_update_rejects_non_buffers(self):
+        hasher = DropboxContentHasher()
+        with pytest.raises(TypeError):
+            hasher.update(12)
+
+    @pytest.mark.parametrize(
+        "wrap", [bytearray, memoryview, lambda data: memoryview(data).cast("H")]
+    )
+    def test_update_accepts_buffers(self, wrap):
+        data = b"b" * (BLOCK_SIZE + 10)
+        hasher = DropboxContentHasher()
+        hasher.update(wrap(data[:6]))
+        hasher.update(wrap(data[6:]))
+        assert hasher.hexdigest() == content_hash(data)
+
     def test_cannot_reuse_after_digest(self):
         hasher = DropboxContentHasher()
         hasher.update(b"data")
@@ -77,6 +94,58 @@ class TestContentHash:
         c.update(b"-copy")
         assert h.hexdigest() != c.hexdigest()
 
+    def test_block_digests_lists_each_block_in_order(self):
+        data = b"a" * BLOCK_SIZE + b"b" * BLOCK_SIZE + b"tail"
+        hasher = DropboxContentHasher()
+        hasher.update(data[:10])
+        assert hasher.block_digests() == [hashlib.sha256(data[:10]).digest()]
+        hasher.update(data[10:])
+        assert hasher.block_digests() == [
+            hashlib.sha256(data[i : i + BLOCK_SIZE]).digest()
+            for i in range(0, len(data), BLOCK_SIZE)
+        ]
+        assert hasher.hexdigest() == content_hash(data)
+
+    def test_state_round_trips_through_json(self):
+        data = b"c" * (BLOCK_SIZE * 2 + 99)
+        hasher = DropboxContentHasher()
+        hasher.update(data[: BLOCK_SIZE * 2 + 50])
+        state = json.loads(json.dumps(hasher.state()))
+        assert state["offset"] == BLOCK_SIZE * 2
+
+        restored = DropboxContentHasher.from_state(state)
+        restored.update(data[state["offset"] :])
+        assert restored.block_digests() == hasher.block_digests()[:2] + [
+            hashlib.sha256(data[BLOCK_SIZE * 2 :]).digest()
+        ]
+        assert restored.hexdigest() == content_hash(data)
+
+    def test_from_state_rejects_inconsistent_state(self):
+        state = DropboxContentHasher().state()
+        with pytest.raises(ValueError):
+            DropboxContentHasher.from_state(dict(state, offset=BLOCK_SIZE))
+        with pytest.raises(ValueError):
+            DropboxContentHasher.from_state(dict(state, version=99))
+
+
+class TestParallelContentHash:
+    @pytest.mark.parametrize("size", [0, 1, BLOCK_SIZE, BLOCK_SIZE * 3 + 7])
+    def test_matches_serial_hash_for_files(self, tmp_path, size):
+        data = bytes(range(256)) * (size // 256) + b"z" * (size % 256)
+        path = tmp_path / "data.bin"
+        path.write_bytes(data)
+        assert parallel_content_hash(str(path), workers=3) == content_hash(data)
+        assert parallel_content_hash(path) == content_hash(data)
+
+    def test_accepts_buffers(self):
+        data = b"q" * (BLOCK_SIZE * 2 + 1)
+        assert parallel_content_hash(bytearray(data), workers=2) == content_hash(data)
+        assert parallel_content_hash(memoryview(data), workers=1) == content_hash(data)
+
+    def test_folds_digests_in_block_order(self):
+        data = b"".join(bytes([n]) * BLOCK_SIZE for n in range(20))
+        assert parallel_content_hash(data, workers=4) == _reference_hash(data)
+
 
 class TestStreamHasher:
     def test_read_hashes_passthrough(self):
@@ -1,7 +1,9 @@
 #!/usr/bin/env python
 
+import email.message
 import inspect
 import json
+import os
 import pickle
 from datetime import datetime, timedelta
 
@@ -764,7 +766,7 @@ class TestAutoContentHash:
             extra_headers=None,
         ):
             captured["arg"] = json.loads(serialized_arg)
-            return RouteResult(self._fake_file_metadata(len(data), content_hash(data)))
+            return RouteResult(self._fake_file_metadata(len(data), content_hash(bytes(data))))
 
         dbx.request_json_string_with_retry = fake_request
         dbx.check_and_refresh_access_token = lambda: None
@@ -790,9 +792,140 @@ class TestAutoContentHash:
         arg = self._capture_upload(dbx, data, content_hash=caller_hash)
         assert arg["content_hash"] == caller_hash
 
+    def test_upload_adds_content_hash_for_buffers(self):
+        data = bytearray(b"hello world")
+        dbx = Dropbox(oauth2_access_token=ACCESS_TOKEN)
+        arg = self._capture_upload(dbx, memoryview(data)[6:])
+        assert arg["content_hash"] == content_hash(b"world")
+
+    def test_request_sends_buffer_bodies_without_copying(self, mocker):
+        session_obj = create_session()
+        response = mock.MagicMock(
+            status_code=200, headers={"content-type": "application/json"}, content=b"{}"
+        )
+        post = mocker.patch.object(session_obj, "post", return_value=response)
+        dbx = Dropbox(oauth2_access_token=ACCESS_TOKEN, session=session_obj)
+        body = memoryview(bytearray(b"payload"))
+
+        dbx.request_json_string("content", "files/upload", "upload", "{}", USER_AUTH, body)
+
+        assert post.call_args[1]["data"] is body
+        with pytest.raises(TypeError):
+            dbx.request_json_string("content", "files/upload", "upload", "{}", USER_AUTH, "text")
+
 
 class TestSession:
     def test_pickle_session(self):
         session_obj = create_session()
         pickled_session = pickle.dumps(session_obj)
         pickle.loads(pickled_session)
+
+    def test_pickled_session_keeps_pool_metrics(self):
+        session_obj = pickle.loads(pickle.dumps(create_session()))
+        assert session.pool_stats(session_obj).max_connections == session.DEFAULT_POOL_MAXSIZE
+
+    def test_clients_without_session_share_one_pool(self):
+        dbx = Dropbox(ACCESS_TOKEN)
+        team = DropboxTeam(ACCESS_TOKEN)
+        shared = session.shared_session()
+
+        assert dbx._session is shared
+        assert Dropbox("other-token")._session is shared
+        assert dbx.clone(oauth2_access_token="cloned")._session is shared
+        assert dbx.with_path_root(PathRoot.home)._session is shared
+        assert team.as_user(TEAM_MEMBER_ID)._session is shared
+        assert team.as_admin(ADMIN_ID)._session is shared
+        assert Dropbox(ACCESS_TOKEN, ca_certs=CA_CERTS)._session is session.shared_session(CA_CERTS)
+        assert Dropbox(ACCESS_TOKEN, session=create_session())._session is not shared
+
+        with mock.patch.object(shared, "close") as close:
+            with Dropbox(ACCESS_TOKEN):
+                pass
+        close.assert_not_called()
+
+    def test_shared_session_does_not_store_cookies(self):
+        headers = email.message.Message()
+        headers["Set-Cookie"] = "tenant=a; Domain=.dropboxapi.com; Path=/"
+        response = mock.Mock(_original_response=mock.Mock(msg=headers))
+        request = requests.Request("GET", "https://api.dropboxapi.com/2/").prepare()
+
+        private = create_session()
+        requests.cookies.extract_cookies_to_jar(private.cookies, request, response)
+        shared = session.shared_session()
+        requests.cookies.extract_cookies_to_jar(shared.cookies, request, response)
+
+        assert len(private.cookies) == 1
+        assert len(shared.cookies) == 0
+
+    def test_reserve_connections_grows_pools_and_reports_saturation(self):
+        session_obj = session.pinned_session(pool_maxsize=1)
+        adapter = session_obj.get_adapter("https://")
+        pool = adapter.poolmanager.connection_from_host("content.dropboxapi.com", 443, "https")
+
+        first = pool._get_conn()
+        second = pool._get_conn()
+        pool._put_conn(first)
+        pool._put_conn(second)
+        assert session.pool_stats(session_obj) == session.PoolStats(1, 0, 2, 1, 1)
+
+        dbx = Dropbox(ACCESS_TOKEN, session=session_obj)
+        with dbx.reserve_connections(2):
+            assert dbx.pool_stats().max_connections == 3
+            assert dbx.pool_stats().reserved == 2
+            assert pool.pool.maxsize == 3
+            connections = [pool._get_conn() for _ in range(3)]
+            assert dbx.pool_stats().saturated == 1
+        assert dbx.pool_stats().reserved == 0
+        assert dbx.pool_stats().max_connections == 1
+        assert pool.pool.maxsize == 1
+        for conn in connections:
+            pool._put_conn(conn)
+        assert pool.pool.qsize() == 1
+        assert dbx.pool_stats().discarded == 3
+
+    def test_released_reservations_keep_warm_connections(self):
+        session_obj = session.pinned_session(pool_maxsize=2)
+        adapter = session_obj.get_adapter("https://")
+        pool = adapter.poolmanager.connection_from_host("content.dropboxapi.com", 443, "https")
+
+        with session.reserve_connections(session_obj, 3):
+            assert pool.pool.qsize() == 5
+            warm = [mock.Mock(), mock.Mock(), mock.Mock()]
+            for conn in warm:
+                assert pool.pool.get(block=False) is None
+            for conn in warm:
+                pool.pool.put(conn, block=False)
+        assert pool.pool.maxsize == 2
+        assert pool.pool.queue == warm[1:]
+        warm[0].close.assert_called_once_with()
+        for conn in warm[1:]:
+            conn.close.assert_not_called()
+
+    def test_reservations_resize_pools_in_place(self):
+        session_obj = session.pinned_session(pool_maxsize=2)
+        manager = session_obj.get_adapter("https://").poolmanager
+
+        def content_pool():
+            return manager.connection_from_host("content.dropboxapi.com", 443, "https")
+
+        pool = content_pool()
+        with session.reserve_connections(session_obj, 4):
+            assert content_pool() is pool
+            with session.reserve_connections(session_obj, 1):
+                assert content_pool() is pool
+                assert pool.pool.maxsize == 7
+            api_pool = manager.connection_from_host("api.dropboxapi.com", 443, "https")
+            assert api_pool.pool.maxsize == 6
+        assert content_pool() is pool
+        assert pool.pool.maxsize == 2
+        assert api_pool.pool.maxsize == 2
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+    def test_forked_child_gets_new_shared_session(self):
+        shared = session.shared_session()
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if session.shared_session() is not shared else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert session.shared_session() is shared
@@ -1,7 +1,12 @@
 #!/usr/bin/env python
 
+import contextlib
+import gc
+import hashlib
+import io
 import os
 import threading
+import zipfile
 from datetime import datetime
 
 import pytest
@@ -9,20 +14,35 @@ import requests
 
 import dropbox.file_transfer as file_transfer
 from dropbox import files
-from dropbox.content_hash import content_hash
+from dropbox.content_hash import DropboxContentHasher, content_hash
+from dropbox.exceptions import ApiError
 from dropbox.file_transfer import (
+    BatchUploader,
+    BatchUploadOptions,
+    BlockCache,
     Bytes,
     BytesUpload,
+    ContentHashIndex,
     DownloadOptions,
     Downloader,
+    File,
     FileUpload,
+    JSONUploadJournal,
+    LocalHashCache,
     ReaderUpload,
+    RemoteFileReader,
     SizedReaderUpload,
+    SQLiteUploadJournal,
     TransferError,
+    TreeDownloadOptions,
+    TreeUploadOptions,
+    UploadCommitError,
     UploadOptions,
     Uploader,
     download_file,
+    download_tree,
     upload_file,
+    upload_tree,
 )
 
 
@@ -63,6 +83,18 @@ class _Response(object):
         self.closed = True
 
 
+class _ReadIntoResponse(_Response):
+    def __init__(self, data):
+        super(_ReadIntoResponse, self).__init__(data)
+        self.readinto_sizes = []
+
+    def readinto(self, buffer):
+        chunk = self.read(len(buffer))
+        self.readinto_sizes.append(len(buffer))
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+
 class _IterContentOnlyResponse(object):
     def __init__(self, data):
         self._data = data
@@ -89,6 +121,8 @@ class _FakeDropbox(object):
         self.finish_bodies = []
         self.append_committed_lost_response = False
         self.finish_committed_lost_response = False
+        self.single_uploads = []
+        self.single_upload_failures = 0
         self.lock = threading.Lock()
 
     def files_download(self, path, rev=None, extra_headers=None):
@@ -101,6 +135,18 @@ class _FakeDropbox(object):
         self.download_calls.append((start, end - start if extra_headers else None))
         return _metadata(path, self.data), _Response(self.data[start:end])
 
+    def files_get_metadata(self, path):
+        return _metadata(path, self.data)
+
+    def files_upload(self, f, path, mode=None, content_hash=None, **kwargs):
+        assert content_hash == globals()["content_hash"](bytes(f))
+        with self.lock:
+            self.single_uploads.append((path, mode, f))
+            if len(self.single_uploads) <= self.single_upload_failures:
+                raise requests.exceptions.ConnectionError("connection reset")
+            self.uploaded[path] = f
+            return _metadata(path, f)
+
     def files_upload_session_start(self, f, close=False, session_type=None, content_hash=None):
         self.concurrent_session = (
             session_type is not None and getattr(session_type, "is_concurrent", lambda: False)()
@@ -108,7 +154,7 @@ class _FakeDropbox(object):
         return files.UploadSessionStartResult(self.next_session_id)
 
     def files_upload_session_append_v2(self, f, cursor, close=False, content_hash=None):
-        assert content_hash == globals()["content_hash"](f)
+        assert content_hash == globals()["content_hash"](bytes(f))
         with self.lock:
             self.append_calls += 1
             self.chunks[cursor.offset] = f
@@ -120,7 +166,7 @@ class _FakeDropbox(object):
                 )
 
     def files_upload_session_finish(self, f, cursor, commit, content_hash=None):
-        assert content_hash == globals()["content_hash"](f)
+        assert content_hash == globals()["content_hash"](bytes(f))
         with self.lock:
             self.finish_calls += 1
             self.finish_bodies.append(f)
@@ -139,6 +185,11 @@ class _FakeDropbox(object):
             return _metadata(commit.path, data)
 
 
+@pytest.fixture
+def session_uploads(monkeypatch):
+    monkeypatch.setattr(file_transfer, "UPLOAD_SINGLE_REQUEST_THRESHOLD", -1)
+
+
 class _EndpointError(Exception):
     def __init__(self, endpoint_error):
         super(_EndpointError, self).__init__("endpoint error")
@@ -173,7 +224,32 @@ def test_download_file_target_commits_temp_file(tmp_path):
     assert not list(tmp_path.glob("*.part"))
 
 
-def test_parallel_download_uses_ranged_requests_and_progress():
+def _small_download_ranges(monkeypatch, size):
+    monkeypatch.setattr(file_transfer, "DOWNLOAD_RANGE_SIZE", size)
+    monkeypatch.setattr(file_transfer, "DOWNLOAD_RANGE_ALIGNMENT", size)
+
+
+@pytest.mark.parametrize("mode", ["pwrite", "mmap", "seek"])
+def test_parallel_download_file_target_write_modes(monkeypatch, tmp_path, mode):
+    _small_download_ranges(monkeypatch, 4)
+    if mode == "seek":
+        monkeypatch.delattr(file_transfer.os, "pwrite")
+        monkeypatch.delattr(file_transfer.os, "pread", raising=False)
+    data = bytes(range(200))
+    local = tmp_path / "modes.bin"
+
+    Downloader(_FakeDropbox(data)).download(
+        "/modes.bin",
+        File(str(local), use_mmap=mode == "mmap"),
+        DownloadOptions(parallel_downloads=4),
+    )
+
+    assert local.read_bytes() == data
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_parallel_download_uses_ranged_requests_and_progress(monkeypatch):
+    _small_download_ranges(monkeypatch, 3)
     data = b"0123456789"
     dbx = _FakeDropbox(data)
     target = Bytes()
@@ -188,12 +264,14 @@ def test_parallel_download_uses_ranged_requests_and_progress():
     assert result.metadata.size == len(data)
     assert target.bytes() == data
     assert dbx.download_calls[0] == (0, 1)
-    assert sorted(dbx.download_calls[1:]) == [(1, 3), (4, 3), (7, 3)]
+    assert sorted(dbx.download_calls[1:]) == [(1, 2), (3, 3), (6, 3), (9, 1)]
     assert progress[-1].bytes_committed == len(data)
     assert progress[-1].total_bytes == len(data)
 
 
-def test_parallel_download_uses_public_range_headers():
+def test_parallel_download_uses_public_range_headers(monkeypatch):
+    _small_download_ranges(monkeypatch, 3)
+
     class HeaderAwareDropbox(_FakeDropbox):
         def files_download(self, path, rev=None, extra_headers=None):
             self.download_calls.append((path, rev, extra_headers))
@@ -215,12 +293,100 @@ def test_parallel_download_uses_public_range_headers():
     assert target.bytes() == b"0123456789"
     assert dbx.download_calls[0][2] == {"Range": "bytes=0-0"}
     assert sorted(call[2]["Range"] for call in dbx.download_calls[1:]) == [
-        "bytes=1-3",
-        "bytes=4-6",
-        "bytes=7-9",
+        "bytes=1-2",
+        "bytes=3-5",
+        "bytes=6-8",
+        "bytes=9-9",
     ]
 
 
+def test_parallel_download_runs_more_ranges_than_workers(monkeypatch):
+    _small_download_ranges(monkeypatch, 2)
+    data = b"0123456789abcdef"
+    dbx = _FakeDropbox(data)
+    target = Bytes()
+
+    Downloader(dbx).download("/many.bin", target, DownloadOptions(parallel_downloads=2))
+
+    assert target.bytes() == data
+    assert len(dbx.download_calls) == 9
+
+
+def test_range_scheduler_splits_straggler_tail():
+    scheduler = file_transfer._RangeScheduler([file_transfer._ByteRange(0, 16)], 16, 4)
+
+    straggler = scheduler.next_task()
+    assert scheduler.reserve(straggler, 0, 4) == 4
+    stolen = scheduler.next_task()
+
+    assert (stolen.offset, stolen.end) == (12, 16)
+    assert straggler.end == 12
+    assert scheduler.reserve(straggler, 4, 32) == 8
+    assert scheduler.reserve(straggler, 12, 32) == 0
+
+
+def test_range_scheduler_does_not_split_inside_alignment():
+    scheduler = file_transfer._RangeScheduler([file_transfer._ByteRange(0, 8)], 4, 4)
+
+    first = scheduler.next_task()
+    second = scheduler.next_task()
+    scheduler.reserve(first, 0, 1)
+
+    assert (first.offset, first.end, second.offset, second.end) == (0, 4, 4, 8)
+    assert scheduler.next_task() is None
+
+
+def test_parallel_download_hashes_blocks_out_of_order(monkeypatch, tmp_path):
+    monkeypatch.setattr(DropboxContentHasher, "BLOCK_SIZE", 4)
+    _small_download_ranges(monkeypatch, 6)
+    data = b"0123456789abcdefghij"
+    local = tmp_path / "blocks.bin"
+    bytes_target = Bytes()
+
+    Downloader(_FakeDropbox(data)).download(
+        "/blocks.bin", bytes_target, DownloadOptions(parallel_downloads=3)
+    )
+    Downloader(_FakeDropbox(data)).download(
+        "/blocks.bin", File(str(local)), DownloadOptions(parallel_downloads=3)
+    )
+
+    assert bytes_target.bytes() == data
+    assert local.read_bytes() == data
+
+
+def test_download_hasher_reads_back_only_out_of_order_pieces(monkeypatch):
+    monkeypatch.setattr(DropboxContentHasher, "BLOCK_SIZE", 4)
+    data = b"0123456789"
+    reads = []
+
+    def read_at(offset, length):
+        reads.append((offset, length))
+        return data[offset : offset + length]
+
+    hasher = file_transfer._DownloadHasher(len(data), read_at)
+    hasher.update(6, data[6:])
+    hasher.update(2, data[2:6])
+    hasher.update(0, data[0:2])
+
+    assert hasher.hexdigest() == content_hash(data)
+    assert reads == [(6, 2), (2, 2)]
+
+
+def test_download_file_target_rejects_content_hash_mismatch(tmp_path):
+    class CorruptDropbox(_FakeDropbox):
+        def files_download(self, path, rev=None, extra_headers=None):
+            metadata, _ = super(CorruptDropbox, self).files_download(path, rev, extra_headers)
+            return metadata, _Response(b"corrupt")
+
+    local = tmp_path / "corrupt.bin"
+
+    with pytest.raises(TransferError, match="content hash mismatch"):
+        Downloader(CorruptDropbox(b"correct")).download("/corrupt.bin", File(str(local)))
+
+    assert not local.exists()
+    assert not list(tmp_path.glob("*.part"))
+
+
 def test_download_handles_partial_target_writes():
     class PartialWriteTarget(object):
         def __init__(self):
@@ -285,6 +451,24 @@ def test_download_retries_request_failure(monkeypatch):
 
     assert result.metadata.size == 6
     assert target.bytes() == b"abcdef"
+    assert b"".join(Downloader(FlakyRequestDropbox(b"abcdef")).stream("/remote.txt")) == b"abcdef"
+
+
+def test_download_and_stream_stop_after_max_attempts(monkeypatch):
+    monkeypatch.setattr(file_transfer, "_wait_for_retry", lambda attempt, max_attempts: None)
+
+    class DownDropbox(_FakeDropbox):
+        def files_download(self, path, rev=None, extra_headers=None):
+            self.download_calls.append(path)
+            raise EOFError("request failed")
+
+    dbx = DownDropbox(b"abcdef")
+    with pytest.raises(EOFError):
+        Downloader(dbx).download("/remote.txt", Bytes(), DownloadOptions(max_attempts=3))
+    with pytest.raises(EOFError):
+        list(Downloader(dbx).stream("/remote.txt", max_attempts=3))
+
+    assert len(dbx.download_calls) == 6
 
 
 @pytest.mark.parametrize(
@@ -327,6 +511,414 @@ def test_download_accepts_requests_style_response_body():
     assert target.bytes() == b"abcdef"
 
 
+class _FailingRangeDropbox(_FakeDropbox):
+    def __init__(self, data, fail_from):
+        super(_FailingRangeDropbox, self).__init__(data)
+        self.fail_from = fail_from
+
+    def files_download(self, path, rev=None, extra_headers=None):
+        start = int(extra_headers["Range"].removeprefix("bytes=").split("-", 1)[0])
+        if start >= self.fail_from:
+            raise ValueError("process killed")
+        return super(_FailingRangeDropbox, self).files_download(path, rev, extra_headers)
+
+
+def test_resumable_file_target_fetches_only_missing_ranges(monkeypatch, tmp_path):
+    _small_download_ranges(monkeypatch, 512)
+    data = bytes(range(256)) * 4
+    local = tmp_path / "big.bin"
+
+    with pytest.raises(ValueError):
+        Downloader(_FailingRangeDropbox(data, 512)).download(
+            "/big.bin", File(str(local), resumable=True), DownloadOptions(parallel_downloads=2)
+        )
+
+    assert not local.exists()
+    assert (tmp_path / ".big.bin.part").exists()
+    assert (tmp_path / ".big.bin.part.journal").exists()
+
+    dbx = _FakeDropbox(data)
+    Downloader(dbx).download("/big.bin", File(str(local), resumable=True))
+
+    assert dbx.download_calls == [(0, 1), (512, 512)]
+    assert local.read_bytes() == data
+    assert not list(tmp_path.glob(".big.bin.part*"))
+
+
+def test_resumable_file_target_discards_journal_for_changed_file(monkeypatch, tmp_path):
+    _small_download_ranges(monkeypatch, 50)
+    local = tmp_path / "big.bin"
+
+    with pytest.raises(ValueError):
+        Downloader(_FailingRangeDropbox(b"a" * 100, 50)).download(
+            "/big.bin", File(str(local), resumable=True), DownloadOptions(parallel_downloads=2)
+        )
+
+    class ChangedDropbox(_FakeDropbox):
+        def files_download(self, path, rev=None, extra_headers=None):
+            metadata, body = super(ChangedDropbox, self).files_download(path, rev, extra_headers)
+            return _metadata(path, self.data, rev="987654321"), body
+
+    dbx = ChangedDropbox(b"b" * 100)
+    Downloader(dbx).download("/big.bin", File(str(local), resumable=True))
+
+    assert dbx.download_calls == [(0, 1), (1, 49), (50, 50)]
+    assert local.read_bytes() == b"b" * 100
+
+
+def test_download_reads_into_reused_buffer_with_configured_chunk_size():
+    responses = []
+
+    class ReadIntoDropbox(_FakeDropbox):
+        def files_download(self, path, rev=None, extra_headers=None):
+            responses.append(_ReadIntoResponse(self.data))
+            return _metadata(path, self.data), responses[-1]
+
+    data = b"0123456789"
+    target = Bytes()
+
+    Downloader(ReadIntoDropbox(data)).download("/remote.bin", target, DownloadOptions(chunk_size=4))
+
+    assert target.bytes() == data
+    assert responses[0].readinto_sizes == [4, 4, 2]
+
+
+def test_response_reader_prefers_raw_readinto_for_identity_encoding():
+    class RawResponse(object):
+        def __init__(self, data, encoding=None):
+            self.raw = _ReadIntoResponse(data)
+            self.headers = {"Content-Encoding": encoding} if encoding else {}
+            self.iterated = False
+
+        def iter_content(self, chunk_size):
+            self.iterated = True
+            return iter([b"decoded"])
+
+        def close(self):
+            pass
+
+    plain = RawResponse(b"raw bytes")
+    reader = file_transfer._ResponseReader(plain, 4)
+    buffer = bytearray(4)
+    assert reader.readinto(buffer) == 4
+    assert bytes(buffer) == b"raw "
+    assert reader.read() == b"bytes"
+    assert not plain.iterated
+
+    gzipped = RawResponse(b"compressed", encoding="gzip")
+    reader = file_transfer._ResponseReader(gzipped, 4)
+    assert reader.read(3) == b"dec"
+    assert reader.read(10) == b"oded"
+    assert reader.read(10) == b""
+
+
+class _TreeDropbox(_FakeDropbox):
+    def __init__(self, tree, page_size=2):
+        super(_TreeDropbox, self).__init__()
+        self.tree = tree
+        self.page_size = page_size
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.list_calls = []
+
+    def _entries(self, path):
+        entries = []
+        for name in sorted(self.tree):
+            full = path.rstrip("/") + "/" + name
+            if self.tree[name] is None:
+                entries.append(
+                    files.FolderMetadata(
+                        name=name, id="id:" + name, path_lower=full.lower(), path_display=full
+                    )
+                )
+            else:
+                entries.append(_metadata(full, self.tree[name]))
+        return entries
+
+    def files_list_folder(self, path, recursive=False, include_non_downloadable_files=True):
+        self.list_calls.append((path, recursive, include_non_downloadable_files))
+        return self.files_list_folder_continue("{}|0".format(path))
+
+    def files_list_folder_continue(self, cursor):
+        path, start = cursor.rsplit("|", 1)
+        entries = self._entries(path)
+        end = int(start) + self.page_size
+        cursor = "{}|{}".format(path, end)
+        return files.ListFolderResult(entries[int(start) : end], cursor, end < len(entries))
+
+    def files_download(self, path, rev=None, extra_headers=None):
+        name = path.split("/", 2)[2]
+        data = self.tree[next(key for key in self.tree if key.lower() == name)]
+        with self.lock:
+            self.download_calls.append((path, extra_headers))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        start = 0
+        end = len(data)
+        if extra_headers:
+            start_text, end_text = extra_headers["Range"].removeprefix("bytes=").split("-", 1)
+            start = int(start_text)
+            end = int(end_text) + 1 if end_text else len(data)
+
+        dbx = self
+
+        class CountingResponse(_Response):
+            def close(self):
+                if not self.closed:
+                    with dbx.lock:
+                        dbx.in_flight -= 1
+                super(CountingResponse, self).close()
+
+        return _metadata(path, data), CountingResponse(data[start:end])
+
+
+def test_download_tree_mirrors_folder_with_aggregate_progress(tmp_path):
+    tree = {
+        "a.txt": b"alpha",
+        "b.txt": b"bravo",
+        "big.bin": bytes(range(100)),
+        "empty.txt": b"",
+        "sub": None,
+    }
+    dbx = _TreeDropbox(tree)
+    progress = []
+
+    result = download_tree(
+        dbx,
+        "/Remote",
+        str(tmp_path / "mirror"),
+        TreeDownloadOptions(
+            max_files=3,
+            max_connections=2,
+            parallel_downloads=2,
+            large_file_threshold=50,
+            progress=progress.append,
+        ),
+    )
+
+    assert dbx.list_calls == [("/Remote", True, False)]
+    assert sorted(m.name for m in result.downloaded) == ["a.txt", "b.txt", "big.bin", "empty.txt"]
+    assert result.failed == {}
+    for name, data in tree.items():
+        if data is None:
+            assert (tmp_path / "mirror" / name).is_dir()
+        else:
+            assert (tmp_path / "mirror" / name).read_bytes() == data
+    assert dbx.max_in_flight <= 2
+    assert any(call[0] == "/remote/big.bin" and call[1] for call in dbx.download_calls)
+    assert progress[-1] == file_transfer.TreeDownloadProgress(4, 4, 110, 110)
+
+
+def test_download_tree_reports_failed_files(tmp_path):
+    class BrokenDropbox(_TreeDropbox):
+        def files_download(self, path, rev=None, extra_headers=None):
+            if path.endswith("bad.txt"):
+                raise ValueError("forbidden")
+            return super(BrokenDropbox, self).files_download(path, rev, extra_headers)
+
+    dbx = BrokenDropbox({"bad.txt": b"bad", "good.txt": b"good"})
+
+    result = Downloader(dbx).download_tree("/remote", str(tmp_path))
+
+    assert [m.name for m in result.downloaded] == ["good.txt"]
+    assert list(result.failed) == ["/remote/bad.txt"]
+    assert (tmp_path / "good.txt").read_bytes() == b"good"
+
+
+class _CountingHashCache(LocalHashCache):
+    def __init__(self):
+        super(_CountingHashCache, self).__init__()
+        self.hashed = []
+
+    def content_hash(self, path):
+        self.hashed.append(path)
+        return super(_CountingHashCache, self).content_hash(path)
+
+
+def _write_old_file(path, data):
+    path.write_bytes(data)
+    os.utime(str(path), (1700000000, 1700000000))
+
+
+def test_download_skip_unchanged_keeps_matching_local_file(tmp_path):
+    local = tmp_path / "same.txt"
+    _write_old_file(local, b"unchanged")
+    cache = _CountingHashCache()
+    dbx = _FakeDropbox(b"unchanged")
+
+    result = Downloader(dbx).download(
+        "/same.txt",
+        File(str(local)),
+        DownloadOptions(skip_unchanged=True, hash_cache=cache),
+    )
+
+    assert result.skipped
+    assert cache.hashed == [str(local)]
+    assert dbx.download_calls == []
+    assert local.stat().st_mtime == 1700000000
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_download_skip_unchanged_replaces_changed_local_file(tmp_path):
+    local = tmp_path / "changed.txt"
+    _write_old_file(local, b"old data!")
+
+    result = Downloader(_FakeDropbox(b"new data!")).download(
+        "/changed.txt",
+        File(str(local)),
+        DownloadOptions(parallel_downloads=2, skip_unchanged=True, hash_cache=LocalHashCache()),
+    )
+
+    assert not result.skipped
+    assert local.read_bytes() == b"new data!"
+
+
+def test_local_hash_cache_hashes_unmodified_file_once(tmp_path, monkeypatch):
+    local = tmp_path / "cached.bin"
+    _write_old_file(local, b"cached")
+    hashed = []
+    real_hash = file_transfer._hash_local_file
+    monkeypatch.setattr(
+        file_transfer, "_hash_local_file", lambda path: hashed.append(path) or real_hash(path)
+    )
+    cache = LocalHashCache()
+
+    assert cache.content_hash(str(local)) == content_hash(b"cached")
+    assert cache.content_hash(str(local)) == content_hash(b"cached")
+    assert len(hashed) == 1
+
+    _write_old_file(local, b"edited")
+    os.utime(str(local), (1700000001, 1700000001))
+    assert cache.content_hash(str(local)) == content_hash(b"edited")
+    assert len(hashed) == 2
+
+
+def test_local_hash_cache_evicts_least_recently_used_entries(tmp_path):
+    paths = []
+    for name in ("a", "b", "c"):
+        _write_old_file(tmp_path / name, name.encode())
+        paths.append(str(tmp_path / name))
+    cache = LocalHashCache(max_entries=2)
+
+    cache.content_hash(paths[0])
+    cache.content_hash(paths[1])
+    cache.content_hash(paths[0])
+    cache.content_hash(paths[2])
+
+    remaining = {key[1] for key in cache._hashes}
+    assert remaining == {os.stat(paths[0]).st_ino, os.stat(paths[2]).st_ino}
+
+
+def test_download_tree_skips_unchanged_files_without_requests(tmp_path):
+    dbx = _TreeDropbox({"keep.txt": b"keep", "new.txt": b"new"})
+    _write_old_file(tmp_path / "keep.txt", b"keep")
+
+    result = download_tree(dbx, "/remote", str(tmp_path), TreeDownloadOptions(skip_unchanged=True))
+
+    assert [m.name for m in result.skipped] == ["keep.txt"]
+    assert [m.name for m in result.downloaded] == ["new.txt"]
+    assert [call[0] for call in dbx.download_calls] == ["/remote/new.txt"]
+
+
+def test_delta_download_reuses_local_prefix_of_grown_file(tmp_path):
+    local = tmp_path / "log.txt"
+    local.write_bytes(b"hello ")
+    dbx = _FakeDropbox(b"hello world")
+
+    result = Downloader(dbx).download("/log.txt", File(str(local)), DownloadOptions(delta=True))
+
+    assert not result.skipped
+    assert dbx.download_calls == [(0, 1), (6, 5)]
+    assert local.read_bytes() == b"hello world"
+
+
+def test_delta_download_refetches_seeded_range_when_local_prefix_differs(tmp_path):
+    local = tmp_path / "log.txt"
+    local.write_bytes(b"HELLO ")
+    dbx = _FakeDropbox(b"hello world")
+
+    Downloader(dbx).download("/log.txt", File(str(local)), DownloadOptions(delta=True))
+
+    assert dbx.download_calls == [(0, 1), (6, 5), (1, 5)]
+    assert local.read_bytes() == b"hello world"
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_delta_download_does_not_seed_without_content_hash(tmp_path):
+    class UnhashedDropbox(_FakeDropbox):
+        def files_download(self, path, rev=None, extra_headers=None):
+            metadata, body = super(UnhashedDropbox, self).files_download(path, rev, extra_headers)
+            metadata.content_hash = None
+            return metadata, body
+
+    local = tmp_path / "log.txt"
+    local.write_bytes(b"XXXXXX")
+    dbx = UnhashedDropbox(b"hello world")
+
+    Downloader(dbx).download("/log.txt", File(str(local)), DownloadOptions(delta=True))
+
+    assert dbx.download_calls == [(0, 1), (1, 10)]
+    assert local.read_bytes() == b"hello world"
+
+
+def test_delta_download_does_not_reuse_same_size_file(tmp_path):
+    local = tmp_path / "image.bin"
+    local.write_bytes(b"old image")
+    dbx = _FakeDropbox(b"new image")
+
+    Downloader(dbx).download("/image.bin", File(str(local)), DownloadOptions(delta=True))
+
+    assert dbx.download_calls == [(0, 1), (1, 8)]
+    assert local.read_bytes() == b"new image"
+
+
+def test_stream_yields_chunks_in_order_and_resumes(monkeypatch):
+    monkeypatch.setattr(file_transfer, "_wait_for_retry", lambda attempt, max_attempts: None)
+
+    class DroppingDropbox(_FakeDropbox):
+        def files_download(self, path, rev=None, extra_headers=None):
+            metadata, body = super(DroppingDropbox, self).files_download(path, rev, extra_headers)
+            if len(self.download_calls) == 1:
+                body._fail_after = 5
+            return metadata, body
+
+    dbx = DroppingDropbox(b"0123456789")
+
+    chunks = list(Downloader(dbx).stream("/stream.bin", chunk_size=3))
+
+    assert chunks == [b"012", b"34", b"567", b"89"]
+    assert dbx.download_calls == [(0, None), (5, 5)]
+
+
+def test_stream_raises_after_last_chunk_on_hash_mismatch():
+    class CorruptDropbox(_FakeDropbox):
+        def files_download(self, path, rev=None, extra_headers=None):
+            metadata, _ = super(CorruptDropbox, self).files_download(path, rev, extra_headers)
+            return metadata, _Response(b"corrupt")
+
+    chunks = []
+    with pytest.raises(file_transfer.ContentHashMismatchError):
+        for chunk in Downloader(CorruptDropbox(b"correct")).stream("/bad.bin"):
+            chunks.append(chunk)
+
+    assert chunks == [b"corrupt"]
+
+
+def test_stream_rejects_metadata_change_on_resume(monkeypatch):
+    monkeypatch.setattr(file_transfer, "_wait_for_retry", lambda attempt, max_attempts: None)
+
+    class ChangingDropbox(_FakeDropbox):
+        def files_download(self, path, rev=None, extra_headers=None):
+            _, body = super(ChangingDropbox, self).files_download(path, rev, extra_headers)
+            if len(self.download_calls) == 1:
+                body._fail_after = 2
+                return _metadata(path, self.data), body
+            return _metadata(path, self.data, rev="987654321"), body
+
+    with pytest.raises(TransferError, match="remote file changed"):
+        list(Downloader(ChangingDropbox(b"abcdef")).stream("/changing.bin"))
+
+
 def test_upload_bytes_source_sequential():
     dbx = _FakeDropbox()
     progress = []
@@ -375,7 +967,7 @@ def test_upload_sized_reader_rejects_declared_size_mismatch():
         )
 
 
-def test_parallel_upload_uses_concurrent_session():
+def test_parallel_upload_uses_concurrent_session(session_uploads):
     dbx = _FakeDropbox()
     progress = []
 
@@ -391,6 +983,62 @@ def test_parallel_upload_uses_concurrent_session():
     assert progress[-1].bytes_committed == 6
 
 
+def test_parallel_upload_pipelines_ranges_through_fixed_workers(monkeypatch, session_uploads):
+    monkeypatch.setattr(file_transfer, "UPLOAD_CHUNK_SIZE", 2)
+    data = bytes(range(100))
+    opened = []
+
+    class CountingUpload(object):
+        def __init__(self, data):
+            self._source = BytesUpload(data)
+
+        def size(self):
+            return self._source.size()
+
+        def open_range(self, offset, length):
+            opened.append((offset, length))
+            return self._source.open_range(offset, length)
+
+    class ClosingDropbox(_FakeDropbox):
+        def files_upload_session_append_v2(self, f, cursor, close=False, content_hash=None):
+            with self.lock:
+                self.threads = getattr(self, "threads", set()) | {threading.get_ident()}
+                if close:
+                    assert sorted(self.chunks) == list(range(0, 98, 2))
+            return super(ClosingDropbox, self).files_upload_session_append_v2(
+                f, cursor, close, content_hash
+            )
+
+    dbx = ClosingDropbox()
+    threads_before = threading.active_count()
+    Uploader(dbx).upload(
+        CountingUpload(data), files.CommitInfo("/pipeline.bin"), UploadOptions(parallel_uploads=4)
+    )
+
+    assert dbx.uploaded["/pipeline.bin"] == data
+    assert opened == [(0, 100)]
+    assert len(dbx.threads) <= 5
+    assert threading.active_count() == threads_before
+
+
+def test_parallel_upload_stops_reading_after_append_failure(monkeypatch, session_uploads):
+    monkeypatch.setattr(file_transfer, "UPLOAD_CHUNK_SIZE", 2)
+
+    class FailingDropbox(_FakeDropbox):
+        def files_upload_session_append_v2(self, f, cursor, close=False, content_hash=None):
+            raise ValueError("append rejected")
+
+    dbx = FailingDropbox()
+    with pytest.raises(ValueError, match="append rejected"):
+        Uploader(dbx).upload(
+            BytesUpload(bytes(1000)),
+            files.CommitInfo("/fail.bin"),
+            UploadOptions(parallel_uploads=2),
+        )
+
+    assert dbx.finish_calls == 0
+
+
 def test_parallel_upload_rejects_one_shot_source():
     with pytest.raises(TransferError, match="ranged upload source"):
         Uploader(_FakeDropbox()).upload(
@@ -400,7 +1048,7 @@ def test_parallel_upload_rejects_one_shot_source():
         )
 
 
-def test_append_incorrect_offset_after_committed_chunk_is_success(monkeypatch):
+def test_append_incorrect_offset_after_committed_chunk_is_success(monkeypatch, session_uploads):
     monkeypatch.setattr(file_transfer, "UPLOAD_CHUNK_SIZE", 3)
     dbx = _FakeDropbox()
     dbx.append_committed_lost_response = True
@@ -412,7 +1060,7 @@ def test_append_incorrect_offset_after_committed_chunk_is_success(monkeypatch):
     assert dbx.uploaded["/retry.bin"] == b"abcdef"
 
 
-def test_finish_incorrect_offset_retries_with_empty_body():
+def test_finish_incorrect_offset_retries_with_empty_body(session_uploads):
     dbx = _FakeDropbox()
     dbx.finish_committed_lost_response = True
 
@@ -430,3 +1078,988 @@ def test_file_upload_source_validates_ranges(tmp_path):
 
     with pytest.raises(TransferError, match="exceeds source size"):
         source.open_range(2, 2)
+
+
+def test_remote_file_reader_reads_sequentially_with_prefetch():
+    data = bytes(range(256)) * 4
+    dbx = _FakeDropbox(data)
+
+    with RemoteFileReader(dbx, "/data.bin", prefetch=2, block_size=100) as reader:
+        assert reader.size == len(data)
+        assert reader.read(50) == data[:50]
+        assert reader.read(150) == data[50:200]
+        assert reader.read() == data[200:]
+        assert reader.read() == b""
+
+    assert sorted(dbx.download_calls) == [
+        (offset, min(100, len(data) - offset)) for offset in range(0, len(data), 100)
+    ]
+
+
+def test_remote_file_reader_seeks_and_drops_prefetched_blocks():
+    data = bytes(range(256)) * 4
+    dbx = _FakeDropbox(data)
+
+    with RemoteFileReader(dbx, "/data.bin", prefetch=1, block_size=100) as reader:
+        assert reader.read(10) == data[:10]
+        assert reader.seek(-24, os.SEEK_END) == 1000
+        assert reader.tell() == 1000
+        assert set(reader._blocks) == set()
+        assert reader.read() == data[1000:]
+        reader.seek(5)
+        buffer = bytearray(20)
+        assert reader.readinto(buffer) == 20
+        assert bytes(buffer) == data[5:25]
+        assert set(reader._blocks) <= {0, 1}
+
+
+def test_remote_file_reader_supports_zipfile():
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as writer:
+        writer.writestr("a.txt", b"alpha" * 100)
+        writer.writestr("b.txt", b"beta" * 100)
+    dbx = _FakeDropbox(archive.getvalue())
+
+    with RemoteFileReader(dbx, "/archive.zip", block_size=64) as reader:
+        with zipfile.ZipFile(reader) as remote:
+            assert remote.namelist() == ["a.txt", "b.txt"]
+            assert remote.read("b.txt") == b"beta" * 100
+
+
+def test_remote_file_reader_retries_interrupted_block():
+    data = b"abcdefghij" * 10
+
+    class FlakyDropbox(_FakeDropbox):
+        def files_download(self, path, rev=None, extra_headers=None):
+            metadata, body = super(FlakyDropbox, self).files_download(path, rev, extra_headers)
+            if len(self.download_calls) == 1:
+                return metadata, _Response(body._data, fail_after=4)
+            return metadata, body
+
+    dbx = FlakyDropbox(data)
+    with RemoteFileReader(dbx, "/data.bin", prefetch=0, block_size=50) as reader:
+        assert reader.read(50) == data[:50]
+
+    assert dbx.download_calls == [(0, 50), (4, 46)]
+
+
+def test_remote_file_reader_retries_block_after_failed_prefetch(monkeypatch):
+    monkeypatch.setattr(file_transfer, "_wait_for_retry", lambda attempt, max_attempts: None)
+    data = b"abcdefghij" * 10
+
+    class OutageDropbox(_FakeDropbox):
+        down = True
+
+        def files_download(self, path, rev=None, extra_headers=None):
+            if self.down:
+                raise ValueError("outage")
+            return super(OutageDropbox, self).files_download(path, rev, extra_headers)
+
+    dbx = OutageDropbox(data)
+    with RemoteFileReader(dbx, "/data.bin", prefetch=1, block_size=50) as reader:
+        with pytest.raises(ValueError):
+            reader.read(10)
+        dbx.down = False
+        assert reader.read() == data
+
+
+def test_remote_file_reader_close_is_safe_after_failed_open(monkeypatch):
+    class FolderDropbox(_FakeDropbox):
+        def files_get_metadata(self, path):
+            return files.FolderMetadata(name="dir", path_lower=path, path_display=path)
+
+    unraisable = []
+    monkeypatch.setattr("sys.unraisablehook", unraisable.append)
+    with pytest.raises(TransferError):
+        RemoteFileReader(FolderDropbox(), "/dir")
+    gc.collect()
+
+    assert unraisable == []
+
+
+def test_remote_file_reader_rejects_changed_file():
+    data = b"abcdefghij" * 10
+
+    class ChangedDropbox(_FakeDropbox):
+        def files_download(self, path, rev=None, extra_headers=None):
+            _, body = super(ChangedDropbox, self).files_download(path, rev, extra_headers)
+            return _metadata(path, self.data, rev="987654321"), body
+
+    with RemoteFileReader(ChangedDropbox(data), "/data.bin", block_size=50) as reader:
+        with pytest.raises(TransferError, match="rev"):
+            reader.read(10)
+
+
+def test_remote_file_reader_serves_repeated_reads_from_block_cache():
+    data = bytes(range(256)) * 4
+    dbx = _FakeDropbox(data)
+    cache = BlockCache(block_size=100)
+
+    for _ in range(2):
+        with RemoteFileReader(dbx, "/data.bin", prefetch=0, cache=cache) as reader:
+            reader.seek(950)
+            assert reader.read() == data[950:]
+
+    assert dbx.download_calls == [(900, 100), (1000, 24)]
+
+
+def test_remote_file_reader_cache_is_keyed_by_rev():
+    dbx = _FakeDropbox(b"a" * 10)
+    cache = BlockCache(block_size=100)
+    with RemoteFileReader(dbx, "/data.bin", cache=cache) as reader:
+        assert reader.read() == b"a" * 10
+
+    class UpdatedDropbox(_FakeDropbox):
+        def files_get_metadata(self, path):
+            return _metadata(path, self.data, rev="987654321")
+
+        def files_download(self, path, rev=None, extra_headers=None):
+            _, body = super(UpdatedDropbox, self).files_download(path, rev, extra_headers)
+            return _metadata(path, self.data, rev="987654321"), body
+
+    with RemoteFileReader(UpdatedDropbox(b"b" * 10), "/data.bin", cache=cache) as reader:
+        assert reader.read() == b"b" * 10
+
+
+def test_block_cache_evicts_least_recently_used_blocks_from_memory():
+    cache = BlockCache(max_memory_bytes=8)
+    cache.put(("id", "rev", 0), b"aaaa")
+    cache.put(("id", "rev", 1), b"bbbb")
+    assert cache.get(("id", "rev", 0)) == b"aaaa"
+    cache.put(("id", "rev", 2), b"cccc")
+
+    assert cache.get(("id", "rev", 1)) is None
+    assert cache.get(("id", "rev", 0)) == b"aaaa"
+    assert cache.get(("id", "rev", 2)) == b"cccc"
+
+
+def test_block_cache_disk_tier_survives_and_respects_budget(tmp_path):
+    directory = str(tmp_path / "blocks")
+    cache = BlockCache(max_memory_bytes=0, directory=directory, max_disk_bytes=8)
+    cache.put(("id", "rev", 0), b"aaaa")
+    cache.put(("id", "rev", 1), b"bbbb")
+    assert cache.get(("id", "rev", 0)) == b"aaaa"
+    cache.put(("id", "rev", 2), b"cccc")
+
+    assert cache.get(("id", "rev", 1)) is None
+    assert len(os.listdir(directory)) == 2
+
+    reopened = BlockCache(max_memory_bytes=0, directory=directory, max_disk_bytes=8)
+    assert reopened.get(("id", "rev", 0)) == b"aaaa"
+    assert reopened.get(("id", "rev", 2)) == b"cccc"
+
+
+def test_block_cache_disk_tier_evicts_by_recorded_access(tmp_path):
+    directory = str(tmp_path / "blocks")
+    cache = BlockCache(max_memory_bytes=0, directory=directory)
+    cache.put(("id", "rev", 0), b"aaaa")
+    cache.put(("id", "rev", 1), b"bbbb")
+    for name in os.listdir(directory):
+        os.utime(os.path.join(directory, name), (1700000000, 1700000000))
+    cache.get(("id", "rev", 0))
+
+    reopened = BlockCache(max_memory_bytes=0, directory=directory, max_disk_bytes=8)
+    reopened.put(("id", "rev", 2), b"cccc")
+
+    assert reopened.get(("id", "rev", 1)) is None
+    assert reopened.get(("id", "rev", 0)) == b"aaaa"
+
+
+def test_remote_file_reader_disk_cache_is_keyed_by_block_size(tmp_path):
+    data = bytes(range(256)) * 4
+    directory = str(tmp_path / "blocks")
+
+    for block_size in (100, 50):
+        cache = BlockCache(directory=directory, block_size=block_size)
+        with RemoteFileReader(_FakeDropbox(data), "/data.bin", cache=cache) as reader:
+            assert reader.read() == data
+
+
+def test_upload_uses_configured_chunk_size(monkeypatch, session_uploads):
+    monkeypatch.setattr(file_transfer, "UPLOAD_CHUNK_ALIGNMENT", 2)
+    dbx = _FakeDropbox()
+
+    Uploader(dbx).upload(
+        BytesUpload(b"abcdefghij"),
+        files.CommitInfo("/sized.bin"),
+        UploadOptions(parallel_uploads=2, chunk_size=4),
+    )
+
+    assert sorted(dbx.chunks) == [0, 4, 8]
+    assert dbx.uploaded["/sized.bin"] == b"abcdefghij"
+
+
+def test_upload_rejects_invalid_chunk_sizes(session_uploads):
+    with pytest.raises(TransferError, match="must not exceed"):
+        Uploader(_FakeDropbox()).upload(
+            BytesUpload(b"data"),
+            files.CommitInfo("/data.txt"),
+            UploadOptions(chunk_size=file_transfer.UPLOAD_MAX_CHUNK_SIZE + 1),
+        )
+    with pytest.raises(TransferError, match="multiple of"):
+        Uploader(_FakeDropbox()).upload(
+            BytesUpload(b"data"),
+            files.CommitInfo("/data.txt"),
+            UploadOptions(parallel_uploads=2, chunk_size=5 * 1024 * 1024),
+        )
+
+
+def test_adaptive_chunk_sizer_follows_throughput_and_retries():
+    block = file_transfer.UPLOAD_CHUNK_ALIGNMENT
+    sizer = file_transfer._ChunkSizer(2 * block, adaptive=True)
+
+    sizer.record(2 * block, 0.1, 0)
+    assert sizer.size() == 4 * block
+    sizer.record(4 * block, 0.1, 0)
+    sizer.record(8 * block, 0.1, 0)
+    sizer.record(16 * block, 0.1, 0)
+    sizer.record(32 * block, 0.1, 0)
+    assert sizer.size() == file_transfer.UPLOAD_MAX_CHUNK_SIZE
+    sizer.record(sizer.size(), 0.1, 1)
+    assert sizer.size() == 17 * block
+    sizer.record(17 * block, 100.0, 0)
+    assert sizer.size() == 8 * block
+    for _ in range(5):
+        sizer.record(block, 0.1, 2)
+    assert sizer.size() == block
+
+
+def test_fixed_chunk_sizer_ignores_measurements():
+    sizer = file_transfer._ChunkSizer(3)
+    sizer.record(3, 100.0, 2)
+    assert sizer.size() == 3
+
+
+class _BatchDropbox(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.batch_sizes = []
+        self.sessions = {}
+        self.closed = set()
+        self.finish_calls = 0
+        self.rejections = {}
+        self.uploaded = {}
+
+    def files_upload_session_start_batch(self, num_sessions, session_type=None):
+        with self.lock:
+            first = sum(self.batch_sizes)
+            self.batch_sizes.append(num_sessions)
+        session_ids = ["session-{}".format(first + n) for n in range(num_sessions)]
+        return files.UploadSessionStartBatchResult(session_ids)
+
+    def files_upload_session_append_v2(self, f, cursor, close=False, content_hash=None):
+        assert content_hash == globals()["content_hash"](bytes(f))
+        with self.lock:
+            assert cursor.session_id not in self.closed
+            self.sessions.setdefault(cursor.session_id, {})[cursor.offset] = f
+            if close:
+                self.closed.add(cursor.session_id)
+
+    def files_upload_session_finish_batch_v2(self, entries):
+        self.finish_calls += 1
+        results = []
+        for entry in entries:
+            path = entry.commit.path
+            assert entry.cursor.session_id in self.closed
+            chunks = self.sessions.get(entry.cursor.session_id, {})
+            data = b"".join(chunks[offset] for offset in sorted(chunks))
+            assert len(data) == entry.cursor.offset
+            errors = self.rejections.get(path)
+            if errors:
+                results.append(files.UploadSessionFinishBatchResultEntry.failure(errors.pop(0)))
+                continue
+            self.uploaded[path] = data
+            results.append(files.UploadSessionFinishBatchResultEntry.success(_metadata(path, data)))
+        return files.UploadSessionFinishBatchResult(results)
+
+
+def test_batch_upload_commits_files_in_batches(monkeypatch):
+    monkeypatch.setattr(file_transfer, "UPLOAD_CHUNK_SIZE", 3)
+    dbx = _BatchDropbox()
+    contents = {"/f{}.txt".format(n): b"x" * n for n in range(5)}
+
+    result = BatchUploader(dbx).upload(
+        [(BytesUpload(data), path) for path, data in contents.items()],
+        BatchUploadOptions(batch_size=2),
+    )
+
+    assert dbx.batch_sizes == [2, 2, 1]
+    assert dbx.finish_calls == 3
+    assert dbx.uploaded == contents
+    assert sorted(result.uploaded) == sorted(contents)
+    assert result.uploaded["/f4.txt"].size == 4
+    assert result.failed == {}
+
+
+def test_batch_upload_retries_only_retryable_failures(monkeypatch):
+    monkeypatch.setattr(file_transfer, "RETRY_BASE_DELAY", 0)
+    dbx = _BatchDropbox()
+    dbx.rejections = {
+        "/busy.txt": [files.UploadSessionFinishError.too_many_write_operations],
+        "/conflict.txt": [
+            files.UploadSessionFinishError.path(
+                files.WriteError.conflict(files.WriteConflictError.file)
+            )
+        ],
+    }
+
+    result = BatchUploader(dbx).upload(
+        [
+            (BytesUpload(b"ok"), files.CommitInfo("/ok.txt")),
+            (BytesUpload(b"busy"), files.CommitInfo("/busy.txt")),
+            (BytesUpload(b"conflict"), files.CommitInfo("/conflict.txt")),
+        ]
+    )
+
+    assert dbx.batch_sizes == [3, 1]
+    assert sorted(result.uploaded) == ["/busy.txt", "/ok.txt"]
+    assert dbx.uploaded["/busy.txt"] == b"busy"
+    assert list(result.failed) == ["/conflict.txt"]
+    assert isinstance(result.failed["/conflict.txt"], UploadCommitError)
+    assert result.failed["/conflict.txt"].error.is_path()
+
+
+def test_batch_upload_fails_one_shot_sources_instead_of_retrying(monkeypatch):
+    monkeypatch.setattr(file_transfer, "RETRY_BASE_DELAY", 0)
+    dbx = _BatchDropbox()
+    dbx.rejections = {
+        "/busy.bin": [files.UploadSessionFinishError.too_many_write_operations],
+        "/busy.txt": [files.UploadSessionFinishError.too_many_write_operations],
+    }
+
+    result = BatchUploader(dbx).upload(
+        [
+            (ReaderUpload(_Response(b"streamed")), files.CommitInfo("/busy.bin")),
+            (BytesUpload(b"busy"), files.CommitInfo("/busy.txt")),
+        ]
+    )
+
+    assert dbx.batch_sizes == [2, 1]
+    assert list(result.uploaded) == ["/busy.txt"]
+    assert list(result.failed) == ["/busy.bin"]
+    assert result.failed["/busy.bin"].error.is_too_many_write_operations()
+
+
+def test_batch_upload_retries_only_unresolved_entries_after_batch_error(monkeypatch):
+    monkeypatch.setattr(file_transfer, "RETRY_BASE_DELAY", 0)
+
+    class UnreadableSource(object):
+        opens = 0
+
+        def size(self):
+            return 4
+
+        def open(self):
+            UnreadableSource.opens += 1
+            raise OSError("unreadable")
+
+        def open_range(self, offset, length):
+            return self.open()
+
+    class FlakyFinishDropbox(_BatchDropbox):
+        def files_upload_session_finish_batch_v2(self, entries):
+            if self.finish_calls < 3:
+                self.finish_calls += 1
+                raise requests.exceptions.ConnectionError("reset")
+            return super(FlakyFinishDropbox, self).files_upload_session_finish_batch_v2(entries)
+
+    dbx = FlakyFinishDropbox()
+    result = BatchUploader(dbx).upload(
+        [
+            (UnreadableSource(), files.CommitInfo("/unreadable.txt")),
+            (BytesUpload(b"ok"), files.CommitInfo("/ok.txt")),
+        ]
+    )
+
+    assert UnreadableSource.opens == 1
+    assert dbx.batch_sizes == [2, 1]
+    assert list(result.uploaded) == ["/ok.txt"]
+    assert list(result.failed) == ["/unreadable.txt"]
+
+
+def test_batch_upload_rejects_oversized_batches():
+    with pytest.raises(TransferError, match="must not exceed 1000"):
+        BatchUploader(_BatchDropbox()).upload([], BatchUploadOptions(batch_size=1001))
+
+
+def test_small_upload_uses_single_request():
+    dbx = _FakeDropbox()
+    progress = []
+
+    result = Uploader(dbx).upload(
+        BytesUpload(b"small"),
+        files.CommitInfo("/small.txt", mode=files.WriteMode.overwrite),
+        UploadOptions(parallel_uploads=4, progress=progress.append),
+    )
+
+    assert result.metadata.size == 5
+    assert dbx.single_uploads == [("/small.txt", files.WriteMode.overwrite, b"small")]
+    assert dbx.append_calls == 0
+    assert dbx.finish_calls == 0
+    assert [p.bytes_committed for p in progress] == [5]
+
+
+def test_single_request_upload_retries_transient_errors(monkeypatch):
+    monkeypatch.setattr(file_transfer, "RETRY_BASE_DELAY", 0)
+    dbx = _FakeDropbox()
+    dbx.single_upload_failures = 1
+
+    Uploader(dbx).upload(BytesUpload(b"retry"), files.CommitInfo("/retry.txt"))
+
+    assert len(dbx.single_uploads) == 2
+    assert dbx.uploaded["/retry.txt"] == b"retry"
+
+
+def test_single_request_threshold_selects_upload_path():
+    dbx = _FakeDropbox()
+
+    Uploader(dbx).upload(
+        BytesUpload(b"session"),
+        files.CommitInfo("/session.txt"),
+        UploadOptions(single_request_threshold=4),
+    )
+    Uploader(dbx).upload(
+        ReaderUpload(_Response(b"unknown size")),
+        files.CommitInfo("/stream.txt"),
+    )
+
+    assert dbx.single_uploads == []
+    assert dbx.uploaded["/session.txt"] == b"session"
+    assert dbx.uploaded["/stream.txt"] == b"unknown size"
+
+
+class _InterruptedUploadDropbox(_FakeDropbox):
+    def __init__(self, fail_at=None, server_offset=None):
+        super(_InterruptedUploadDropbox, self).__init__()
+        self.fail_at = fail_at
+        self.server_offset = server_offset
+        self.reconciled = []
+
+    def files_upload_session_append_v2(self, f, cursor, close=False, content_hash=None):
+        if not f:
+            self.reconciled.append(cursor.offset)
+            if self.server_offset is not None and cursor.offset != self.server_offset:
+                raise _EndpointError(
+                    files.UploadSessionAppendError.incorrect_offset(
+                        files.UploadSessionOffsetError(self.server_offset)
+                    )
+                )
+            return None
+        if cursor.offset == self.fail_at:
+            raise ValueError("process killed")
+        return super(_InterruptedUploadDropbox, self).files_upload_session_append_v2(
+            f, cursor, close, content_hash
+        )
+
+
+@pytest.mark.parametrize("journal_type", [JSONUploadJournal, SQLiteUploadJournal])
+def test_journaled_upload_resumes_after_restart(
+    tmp_path, monkeypatch, session_uploads, journal_type
+):
+    monkeypatch.setattr(file_transfer, "UPLOAD_CHUNK_SIZE", 3)
+    local = tmp_path / "source.bin"
+    local.write_bytes(b"abcdefghijk")
+    journal = journal_type(str(tmp_path / "journal"))
+    options = UploadOptions(journal=journal)
+    commit = files.CommitInfo("/resume.bin")
+
+    dbx = _InterruptedUploadDropbox(fail_at=6)
+    with pytest.raises(ValueError, match="process killed"):
+        Uploader(dbx).upload(FileUpload(str(local)), commit, options)
+    assert journal.load("/resume.bin")["offset"] == 6
+
+    dbx.fail_at = None
+    dbx.append_calls = 0
+    progress = []
+    result = Uploader(dbx).upload(
+        FileUpload(str(local)), commit, UploadOptions(journal=journal, progress=progress.append)
+    )
+
+    assert dbx.reconciled == [6]
+    assert dbx.append_calls == 1
+    assert result.metadata.size == 11
+    assert dbx.uploaded["/resume.bin"] == b"abcdefghijk"
+    assert progress[0].bytes_committed == 6
+    assert journal.load("/resume.bin") is None
+
+
+def test_journaled_upload_reconciles_offset_ahead_of_journal(
+    tmp_path, monkeypatch, session_uploads
+):
+    monkeypatch.setattr(file_transfer, "UPLOAD_CHUNK_SIZE", 3)
+    journal = JSONUploadJournal(str(tmp_path / "journal.json"))
+    commit = files.CommitInfo("/ahead.bin")
+    source = BytesUpload(b"abcdefghijk")
+    dbx = _InterruptedUploadDropbox(fail_at=6)
+    with pytest.raises(ValueError):
+        Uploader(dbx).upload(source, commit, UploadOptions(journal=journal))
+    record = journal.load("/ahead.bin")
+    record["offset"] = 3
+    journal.save("/ahead.bin", record)
+
+    dbx.fail_at = None
+    dbx.server_offset = 6
+    Uploader(dbx).upload(source, commit, UploadOptions(journal=journal))
+
+    assert dbx.reconciled == [3]
+    assert dbx.uploaded["/ahead.bin"] == b"abcdefghijk"
+
+
+def test_journaled_upload_restarts_for_changed_or_expired_sessions(
+    tmp_path, monkeypatch, session_uploads
+):
+    monkeypatch.setattr(file_transfer, "UPLOAD_CHUNK_SIZE", 3)
+    journal = JSONUploadJournal(str(tmp_path / "journal.json"))
+    commit = files.CommitInfo("/restart.bin")
+    dbx = _InterruptedUploadDropbox(fail_at=6)
+    with pytest.raises(ValueError):
+        Uploader(dbx).upload(BytesUpload(b"abcdefghijk"), commit, UploadOptions(journal=journal))
+
+    dbx.fail_at = None
+    Uploader(dbx).upload(BytesUpload(b"ABCDEFGHIJK"), commit, UploadOptions(journal=journal))
+    assert dbx.reconciled == []
+    assert dbx.uploaded["/restart.bin"] == b"ABCDEFGHIJK"
+
+    dbx.fail_at = 6
+    with pytest.raises(ValueError):
+        Uploader(dbx).upload(BytesUpload(b"abcdefghijk"), commit, UploadOptions(journal=journal))
+    record = journal.load("/restart.bin")
+    record["created"] -= file_transfer.UPLOAD_SESSION_LIFETIME
+    journal.save("/restart.bin", record)
+    dbx.fail_at = None
+    Uploader(dbx).upload(BytesUpload(b"abcdefghijk"), commit, UploadOptions(journal=journal))
+    assert dbx.reconciled == []
+    assert dbx.uploaded["/restart.bin"] == b"abcdefghijk"
+
+
+def test_journaled_upload_requires_ranged_source(tmp_path, session_uploads):
+    with pytest.raises(TransferError, match="ranged upload source"):
+        Uploader(_FakeDropbox()).upload(
+            ReaderUpload(_Response(b"data")),
+            files.CommitInfo("/data.txt"),
+            UploadOptions(journal=JSONUploadJournal(str(tmp_path / "journal.json"))),
+        )
+
+
+def test_sequential_upload_reads_next_chunk_while_appending(monkeypatch, session_uploads):
+    monkeypatch.setattr(file_transfer, "UPLOAD_CHUNK_SIZE", 3)
+    second_read = threading.Event()
+
+    class PipeReader(object):
+        def __init__(self, data):
+            self._data = data
+            self._pos = 0
+
+        def read(self, size=-1):
+            if self._pos >= 3:
+                second_read.set()
+            chunk = self._data[self._pos : self._pos + size]
+            self._pos += len(chunk)
+            return chunk
+
+    class SlowDropbox(_FakeDropbox):
+        def files_upload_session_append_v2(self, f, cursor, close=False, content_hash=None):
+            assert second_read.wait(5), "next chunk was not read during the append"
+            return super(SlowDropbox, self).files_upload_session_append_v2(
+                f, cursor, close, content_hash
+            )
+
+    dbx = SlowDropbox()
+    Uploader(dbx).upload(ReaderUpload(PipeReader(b"abcdefgh")), files.CommitInfo("/pipe.bin"))
+
+    assert dbx.uploaded["/pipe.bin"] == b"abcdefgh"
+
+
+def test_sequential_upload_closes_reader_after_pending_read(monkeypatch, session_uploads):
+    monkeypatch.setattr(file_transfer, "UPLOAD_CHUNK_SIZE", 3)
+    monkeypatch.setattr(file_transfer, "PREFETCH_CLOSE_TIMEOUT", 0.01)
+    reading = threading.Event()
+    release = threading.Event()
+    closed = threading.Event()
+    events = []
+
+    class GatedReader(object):
+        def __init__(self, data):
+            self._data = data
+            self._pos = 0
+
+        def read(self, size=-1):
+            if self._pos >= 3:
+                reading.set()
+                release.wait(5)
+            events.append("read")
+            chunk = self._data[self._pos : self._pos + size]
+            self._pos += len(chunk)
+            return chunk
+
+        def close(self):
+            events.append("close")
+            closed.set()
+
+    class FailingDropbox(_FakeDropbox):
+        def files_upload_session_append_v2(self, f, cursor, close=False, content_hash=None):
+            assert reading.wait(5)
+            raise ValueError("append rejected")
+
+    with pytest.raises(ValueError, match="append rejected"):
+        Uploader(FailingDropbox()).upload(
+            ReaderUpload(GatedReader(b"abcdefgh")), files.CommitInfo("/gated.bin")
+        )
+    assert not closed.is_set()
+    release.set()
+    assert closed.wait(5)
+    assert events == ["read", "read", "close"]
+
+
+def test_sequential_upload_surfaces_read_errors(session_uploads):
+    class BrokenReader(object):
+        def read(self, size=-1):
+            raise OSError("broken pipe")
+
+    dbx = _FakeDropbox()
+    with pytest.raises(OSError, match="broken pipe"):
+        Uploader(dbx).upload(ReaderUpload(BrokenReader()), files.CommitInfo("/broken.bin"))
+    assert dbx.finish_calls == 0
+
+
+def test_upload_hasher_folds_chunk_block_digests(monkeypatch):
+    monkeypatch.setattr(DropboxContentHasher, "BLOCK_SIZE", 4)
+    hashed = []
+    buffer_content_hash = file_transfer.content_hash
+    monkeypatch.setattr(
+        file_transfer,
+        "content_hash",
+        lambda data: hashed.append(data) or buffer_content_hash(data),
+    )
+    data = bytes(range(30))
+
+    aligned = file_transfer._UploadHasher()
+    assert [aligned.chunk_hash(data[i : i + 8]) for i in range(0, 30, 8)] == [
+        content_hash(data[i : i + 8]) for i in range(0, 30, 8)
+    ]
+    assert aligned.hexdigest() == content_hash(data)
+    assert hashed == []
+
+    unaligned = file_transfer._UploadHasher()
+    assert [unaligned.chunk_hash(memoryview(data)[i : i + 6]) for i in range(0, 30, 6)] == [
+        content_hash(data[i : i + 6]) for i in range(0, 30, 6)
+    ]
+    assert unaligned.hexdigest() == content_hash(data)
+
+
+def test_upload_hashes_each_chunk_once_across_retries(monkeypatch, session_uploads):
+    monkeypatch.setattr(file_transfer, "UPLOAD_CHUNK_SIZE", 3)
+    monkeypatch.setattr(file_transfer, "RETRY_BASE_DELAY", 0)
+    hashed = []
+    real_content_hash = file_transfer.content_hash
+    monkeypatch.setattr(
+        file_transfer,
+        "content_hash",
+        lambda data: hashed.append(data) or real_content_hash(data),
+    )
+
+    class FlakyDropbox(_FakeDropbox):
+        def files_upload_session_append_v2(self, f, cursor, close=False, content_hash=None):
+            self.attempts = getattr(self, "attempts", 0) + 1
+            if self.attempts == 1:
+                raise requests.exceptions.ConnectionError("reset")
+            return super(FlakyDropbox, self).files_upload_session_append_v2(
+                f, cursor, close, content_hash
+            )
+
+    dbx = FlakyDropbox()
+    Uploader(dbx).upload(BytesUpload(b"abcdefg"), files.CommitInfo("/once.bin"))
+
+    assert dbx.attempts == 3
+    # The first chunk starts on a block boundary and is folded from block
+    # digests; the unaligned ones are hashed directly, each exactly once.
+    assert hashed == [b"def", b"g"]
+    assert dbx.uploaded["/once.bin"] == b"abcdefg"
+
+
+def test_upload_rejects_committed_content_hash_mismatch(monkeypatch, session_uploads):
+    class CorruptingDropbox(_FakeDropbox):
+        def files_upload_session_finish(self, f, cursor, commit, content_hash=None):
+            super(CorruptingDropbox, self).files_upload_session_finish(
+                f, cursor, commit, content_hash
+            )
+            return _metadata(commit.path, b"corrupt")
+
+    with pytest.raises(file_transfer.ContentHashMismatchError, match="upload content hash"):
+        Uploader(CorruptingDropbox()).upload(BytesUpload(b"content"), files.CommitInfo("/x.bin"))
+
+
+def test_mmap_file_upload_sends_memoryview_slices(tmp_path, monkeypatch, session_uploads):
+    monkeypatch.setattr(file_transfer, "UPLOAD_CHUNK_SIZE", 4)
+    data = bytes(range(200)) * 3
+    local = tmp_path / "source.bin"
+    local.write_bytes(data)
+    bodies = []
+
+    class RecordingDropbox(_FakeDropbox):
+        def files_upload_session_append_v2(self, f, cursor, close=False, content_hash=None):
+            bodies.append(f)
+            return super(RecordingDropbox, self).files_upload_session_append_v2(
+                f, cursor, close, content_hash
+            )
+
+    dbx = RecordingDropbox()
+    source = FileUpload(str(local), use_mmap=True)
+    Uploader(dbx).upload(source, files.CommitInfo("/mapped.bin"), UploadOptions(parallel_uploads=3))
+
+    assert bytes(dbx.uploaded["/mapped.bin"]) == data
+    assert bodies and all(isinstance(body, memoryview) for body in bodies)
+
+
+def test_mmap_file_source_handles_empty_files(tmp_path):
+    local = tmp_path / "empty.bin"
+    local.write_bytes(b"")
+    source = FileUpload(str(local), use_mmap=True)
+    assert source.open().read() == b""
+    source.close()
+
+
+class _TreeUploadDropbox(_BatchDropbox):
+    def __init__(self, remote=None):
+        super(_TreeUploadDropbox, self).__init__()
+        self.remote = remote
+        self.single_uploads = []
+
+    def files_list_folder(self, path, recursive=False, include_non_downloadable_files=True):
+        if self.remote is None:
+            error = files.ListFolderError.path(files.LookupError.not_found)
+            raise ApiError("request-id", error, None, None)
+        entries = [_metadata(path + "/" + name, data) for name, data in self.remote.items()]
+        return files.ListFolderResult(entries, "cursor", False)
+
+    def files_upload(self, f, path, mode=None, content_hash=None, **kwargs):
+        assert content_hash == globals()["content_hash"](bytes(f))
+        assert mode == files.WriteMode.overwrite
+        with self.lock:
+            self.single_uploads.append(path)
+            self.uploaded[path] = bytes(f)
+        return _metadata(path, f)
+
+
+def test_upload_tree_uploads_only_new_and_changed_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_transfer, "UPLOAD_CHUNK_SIZE", 4)
+    local = tmp_path / "local"
+    (local / "sub").mkdir(parents=True)
+    _write_old_file(local / "same.txt", b"same")
+    _write_old_file(local / "changed.txt", b"new text")
+    _write_old_file(local / "sub" / "new.txt", b"fresh")
+    _write_old_file(local / "big.bin", bytes(range(100)))
+    dbx = _TreeUploadDropbox({"same.txt": b"same", "changed.txt": b"old text"})
+    cache_path = str(tmp_path / "hashes.json")
+    progress = []
+
+    result = upload_tree(
+        dbx,
+        str(local),
+        "/Backup",
+        TreeUploadOptions(
+            large_file_threshold=50,
+            hash_cache=LocalHashCache(cache_path),
+            progress=progress.append,
+        ),
+    )
+
+    assert [m.name for m in result.skipped] == ["same.txt"]
+    assert sorted(m.name for m in result.uploaded) == ["big.bin", "changed.txt", "new.txt"]
+    assert result.failed == {}
+    assert dbx.single_uploads == ["/Backup/big.bin"]
+    assert dbx.batch_sizes == [2]
+    assert dbx.uploaded["/Backup/changed.txt"] == b"new text"
+    assert dbx.uploaded["/Backup/sub/new.txt"] == b"fresh"
+    assert progress[-1] == file_transfer.TreeUploadProgress(4, 4, 117, 117)
+
+    dbx.remote = {"same.txt": b"same", "changed.txt": b"new text", "big.bin": bytes(range(100))}
+    dbx.remote["sub/new.txt"] = b"fresh"
+    hashed = []
+    real_hash = file_transfer._hash_local_file
+    monkeypatch.setattr(
+        file_transfer, "_hash_local_file", lambda path: hashed.append(path) or real_hash(path)
+    )
+
+    options = TreeUploadOptions(hash_cache=LocalHashCache(cache_path))
+    result = upload_tree(dbx, str(local), "/Backup", options)
+
+    assert result.uploaded == []
+    assert len(result.skipped) == 4
+    assert sorted(os.path.basename(path) for path in hashed) == ["big.bin", "new.txt"]
+
+
+def test_upload_tree_creates_missing_folder_and_reports_failures(tmp_path):
+    (tmp_path / "a.txt").write_bytes(b"a")
+    (tmp_path / "b.txt").write_bytes(b"b")
+    dbx = _TreeUploadDropbox()
+    dbx.rejections["/new/b.txt"] = [
+        files.UploadSessionFinishError.path(files.WriteError.disallowed_name)
+    ]
+
+    result = Uploader(dbx).upload_tree(str(tmp_path), "/new")
+
+    assert [m.name for m in result.uploaded] == ["a.txt"]
+    assert list(result.failed) == ["/new/b.txt"]
+    assert isinstance(result.failed["/new/b.txt"], UploadCommitError)
+
+
+def test_upload_tree_uploads_journaled_large_files_sequentially(tmp_path, monkeypatch):
+    _write_old_file(tmp_path / "big.bin", bytes(range(100)))
+    used = []
+    real_upload = Uploader.upload
+
+    def upload(self, source, commit_info, options=None):
+        used.append(options.parallel_uploads)
+        return real_upload(self, source, commit_info, options)
+
+    monkeypatch.setattr(Uploader, "upload", upload)
+    options = TreeUploadOptions(
+        large_file_threshold=50,
+        parallel_uploads=4,
+        journal=JSONUploadJournal(str(tmp_path / "journal.json")),
+    )
+
+    result = Uploader(_TreeUploadDropbox()).upload_tree(str(tmp_path), "/new", options)
+
+    assert [m.name for m in result.uploaded] == ["big.bin"]
+    assert used == [1]
+
+
+def test_upload_tree_reports_files_that_cannot_be_opened(tmp_path, monkeypatch):
+    (tmp_path / "a.txt").write_bytes(b"a")
+    (tmp_path / "gone.txt").write_bytes(b"gone")
+    real_upload = file_transfer.FileUpload
+
+    def file_upload(path, use_mmap=False):
+        if os.path.basename(path) == "gone.txt":
+            raise FileNotFoundError(path)
+        return real_upload(path, use_mmap)
+
+    monkeypatch.setattr(file_transfer, "FileUpload", file_upload)
+    dbx = _TreeUploadDropbox()
+
+    result = Uploader(dbx).upload_tree(str(tmp_path), "/new")
+
+    assert [m.name for m in result.uploaded] == ["a.txt"]
+    assert list(result.failed) == ["/new/gone.txt"]
+    assert isinstance(result.failed["/new/gone.txt"], FileNotFoundError)
+    assert dbx.batch_sizes == [1]
+
+
+def _count_indexed_hashes(monkeypatch):
+    hashed = []
+    real_hash = file_transfer._hash_indexed_file
+    monkeypatch.setattr(
+        file_transfer, "_hash_indexed_file", lambda path: hashed.append(path) or real_hash(path)
+    )
+    return hashed
+
+
+def test_content_hash_index_hash_tree_hashes_only_changed_files(tmp_path, monkeypatch):
+    tree = tmp_path / "tree"
+    (tree / "sub").mkdir(parents=True)
+    _write_old_file(tree / "a.txt", b"alpha")
+    _write_old_file(tree / "sub" / "b.txt", b"bravo")
+    hashed = _count_indexed_hashes(monkeypatch)
+    db = str(tmp_path / "index.db")
+
+    index = ContentHashIndex(db)
+    assert index.hash_tree(str(tree), workers=2) == {
+        str(tree / "a.txt"): content_hash(b"alpha"),
+        str(tree / "sub" / "b.txt"): content_hash(b"bravo"),
+    }
+    index.close()
+    assert len(hashed) == 2
+
+    _write_old_file(tree / "sub" / "b.txt", b"bravo!")
+    index = ContentHashIndex(db)
+    result = index.hash_tree(str(tree))
+
+    assert hashed[2:] == [str(tree / "sub" / "b.txt")]
+    assert result[str(tree / "sub" / "b.txt")] == content_hash(b"bravo!")
+
+
+def test_content_hash_index_hash_tree_commits_regular_files_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_transfer, "INDEX_COMMIT_ENTRIES", 2)
+    for n in range(7):
+        _write_old_file(tmp_path / "f{}.txt".format(n), b"x" * n)
+    os.mkfifo(str(tmp_path / "pipe"))
+    index = ContentHashIndex()
+    stored = []
+    real_store = index._store
+    monkeypatch.setattr(
+        index, "_store", lambda entries: stored.append(len(entries)) or real_store(entries)
+    )
+
+    result = index.hash_tree(str(tmp_path), workers=1)
+
+    assert sorted(os.path.basename(path) for path in result) == [
+        "f{}.txt".format(n) for n in range(7)
+    ]
+    assert sum(stored) == 7
+    assert len(stored) > 1
+    assert max(stored) < 7
+
+
+def test_content_hash_index_lookup_invalidate_and_block_hashes(tmp_path, monkeypatch):
+    monkeypatch.setattr(DropboxContentHasher, "BLOCK_SIZE", 4)
+    path = tmp_path / "data.bin"
+    _write_old_file(path, b"0123456789")
+    fresh = tmp_path / "fresh.bin"
+    fresh.write_bytes(b"new")
+    index = ContentHashIndex()
+
+    assert index.lookup([str(path)]) == {str(path): None}
+    assert index.block_hashes(str(path)) == [
+        hashlib.sha256(part).digest() for part in (b"0123", b"4567", b"89")
+    ]
+    index.content_hash(str(fresh))
+    assert index.lookup([str(path), str(fresh), str(tmp_path / "gone")]) == {
+        str(path): index.content_hash(str(path)),
+        str(fresh): None,
+        str(tmp_path / "gone"): None,
+    }
+
+    index.invalidate([str(path)])
+    assert index.lookup([str(path)]) == {str(path): None}
+
+
+def test_content_hash_index_serves_as_download_hash_cache(tmp_path, monkeypatch):
+    dbx = _TreeDropbox({"keep.txt": b"keep"})
+    _write_old_file(tmp_path / "keep.txt", b"keep")
+    hashed = _count_indexed_hashes(monkeypatch)
+    options = TreeDownloadOptions(skip_unchanged=True, hash_cache=ContentHashIndex())
+
+    for _ in range(2):
+        result = download_tree(dbx, "/remote", str(tmp_path), options)
+        assert [m.name for m in result.skipped] == ["keep.txt"]
+
+    assert len(hashed) == 1
+    assert dbx.download_calls == []
+
+
+def test_transfer_workers_reserve_pooled_connections(monkeypatch):
+    _small_download_ranges(monkeypatch, 3)
+
+    class PooledDropbox(_FakeDropbox):
+        reserved = 0
+        peak = 0
+
+        @contextlib.contextmanager
+        def reserve_connections(self, count):
+            with self.lock:
+                self.reserved += count
+                self.peak = max(self.peak, self.reserved)
+            try:
+                yield
+            finally:
+                with self.lock:
+                    self.reserved -= count
+
+    dbx = PooledDropbox(b"0123456789")
+
+    Downloader(dbx).download("/pooled.txt", Bytes(), DownloadOptions(parallel_downloads=3))
+
+    assert 1 <= dbx.peak <= 3
+    assert dbx.reserved == 0